@@ -0,0 +1,130 @@
+"""Partition one_time_passwords by created_at (optional)
+
+Revision ID: 16ca87662db8
+Revises: d60e8cc5d4e5
+Create Date: 2026-10-18 13:00:00.000000
+
+Миграция включается явно:
+    alembic -x otp_partitioning=true upgrade head
+Без флага она ничего не делает. Таблица пересоздается как секционированная
+по месяцам created_at, данные копируются одним INSERT ... SELECT, поэтому
+на больших базах ее стоит запускать в окно обслуживания.
+"""
+from typing import Sequence, Union
+from datetime import datetime, timezone
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '16ca87662db8'
+down_revision: Union[str, None] = 'd60e8cc5d4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    month = moment.month - 1 + months
+    return moment.replace(year=moment.year + month // 12, month=month % 12 + 1)
+
+
+def is_partitioned(connection) -> bool:
+    return connection.execute(sa.text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = 'one_time_passwords' AND pg_table_is_visible(c.oid)
+        )
+    """)).scalar()
+
+
+def create_indexes() -> None:
+    op.create_index('ix_one_time_passwords_id', 'one_time_passwords', ['id'], unique=False)
+    op.create_index('ix_one_time_passwords_phone_number', 'one_time_passwords', ['phone_number'], unique=False)
+    op.create_index(
+        'ix_one_time_passwords_phone_created_unused',
+        'one_time_passwords',
+        ['phone_number', 'created_at'],
+        unique=False,
+        postgresql_where=sa.text('NOT is_used'),
+    )
+
+
+def upgrade() -> None:
+    if context.get_x_argument(as_dictionary=True).get('otp_partitioning') != 'true':
+        return
+
+    connection = op.get_bind()
+    if is_partitioned(connection):
+        return
+
+    op.execute("ALTER TABLE one_time_passwords RENAME TO one_time_passwords_old")
+    op.execute("ALTER TABLE one_time_passwords_old RENAME CONSTRAINT one_time_passwords_pkey TO one_time_passwords_old_pkey")
+    op.drop_index('ix_one_time_passwords_id', table_name='one_time_passwords_old')
+    op.drop_index('ix_one_time_passwords_phone_number', table_name='one_time_passwords_old')
+    op.drop_index('ix_one_time_passwords_phone_created_unused', table_name='one_time_passwords_old')
+
+    # Ключ секционирования обязан входить в первичный ключ
+    op.execute("""
+        CREATE TABLE one_time_passwords (
+            id UUID NOT NULL,
+            phone_number VARCHAR(20) NOT NULL,
+            code INTEGER NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            is_used BOOLEAN NOT NULL,
+            CONSTRAINT one_time_passwords_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    oldest = connection.execute(sa.text("SELECT min(created_at) FROM one_time_passwords_old")).scalar()
+    now = datetime.now(timezone.utc)
+    start = (oldest or now).astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), MONTHS_AHEAD)
+    while start <= last:
+        end = add_months(start, 1)
+        op.execute(
+            f"CREATE TABLE one_time_passwords_p{start:%Y%m} PARTITION OF one_time_passwords "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+    op.execute("CREATE TABLE one_time_passwords_default PARTITION OF one_time_passwords DEFAULT")
+
+    create_indexes()
+
+    op.execute("""
+        INSERT INTO one_time_passwords (id, phone_number, code, created_at, is_used)
+        SELECT id, phone_number, code, created_at, is_used FROM one_time_passwords_old
+    """)
+    op.drop_table('one_time_passwords_old')
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    if not is_partitioned(connection):
+        return
+
+    op.execute("ALTER TABLE one_time_passwords RENAME TO one_time_passwords_old")
+    op.execute("ALTER TABLE one_time_passwords_old RENAME CONSTRAINT one_time_passwords_pkey TO one_time_passwords_old_pkey")
+    op.drop_index('ix_one_time_passwords_id', table_name='one_time_passwords_old')
+    op.drop_index('ix_one_time_passwords_phone_number', table_name='one_time_passwords_old')
+    op.drop_index('ix_one_time_passwords_phone_created_unused', table_name='one_time_passwords_old')
+
+    op.create_table('one_time_passwords',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('phone_number', sa.String(length=20), nullable=False),
+    sa.Column('code', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('is_used', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name='one_time_passwords_pkey')
+    )
+    create_indexes()
+
+    op.execute("""
+        INSERT INTO one_time_passwords (id, phone_number, code, created_at, is_used)
+        SELECT id, phone_number, code, created_at, is_used FROM one_time_passwords_old
+    """)
+    # Секции удаляются вместе с родительской таблицей
+    op.drop_table('one_time_passwords_old')
@@ -0,0 +1,54 @@
+"""Index one_time_passwords by created_at for compaction
+
+Revision ID: 188cf141da1a
+Revises: 3c95cae0f99f
+Create Date: 2026-10-18 23:50:00.000000
+
+Очистка (app/otp_compaction.py) выбирает строки по created_at, а индекса по
+этой колонке не было: после удаления ix_one_time_passwords_phone_number каждая
+пачка читала таблицу целиком.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '188cf141da1a'
+down_revision: Union[str, None] = '3c95cae0f99f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def is_partitioned(connection) -> bool:
+    return connection.execute(sa.text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = 'one_time_passwords' AND pg_table_is_visible(c.oid)
+        )
+    """)).scalar()
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не поддерживается для секционированной таблицы
+    concurrently = not is_partitioned(op.get_bind())
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_one_time_passwords_created_at',
+            'one_time_passwords',
+            ['created_at'],
+            unique=False,
+            postgresql_concurrently=concurrently,
+        )
+
+
+def downgrade() -> None:
+    concurrently = not is_partitioned(op.get_bind())
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_one_time_passwords_created_at',
+            table_name='one_time_passwords',
+            postgresql_concurrently=concurrently,
+        )
@@ -0,0 +1,116 @@
+"""Add revenue rollups with dirty-month triggers
+
+Revision ID: 1895e784ed59
+Revises: 788fd95cc6b2
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1895e784ed59'
+down_revision: Union[str, None] = '788fd95cc6b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Месяц считается по UTC, как хранится created_at
+ORDER_MONTH = "date_trunc('month', {alias}.created_at AT TIME ZONE 'UTC')::date"
+
+
+def upgrade() -> None:
+    op.create_table('revenue_rollups',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('customer_id', sa.UUID(), nullable=False),
+    sa.Column('product_id', sa.UUID(), nullable=False),
+    sa.Column('orders_count', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'month', 'customer_id', 'product_id')
+    )
+    op.create_table('revenue_rollup_dirty',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'month')
+    )
+
+    # Триггеры уровня оператора с transition tables: массовая вставка (COPY, импорт)
+    # дает одну вставку меток на оператор, а не на строку
+    op.execute(f"""
+        CREATE FUNCTION revenue_rollup_mark_orders() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT n.user_id, {ORDER_MONTH.format(alias='n')} FROM new_rows n
+                ON CONFLICT DO NOTHING;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT o.user_id, {ORDER_MONTH.format(alias='o')} FROM old_rows o
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute(f"""
+        CREATE FUNCTION revenue_rollup_mark_order_products() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT ord.user_id, {ORDER_MONTH.format(alias='ord')}
+                FROM (SELECT DISTINCT order_id FROM new_rows) n
+                JOIN orders ord ON ord.id = n.order_id
+                ON CONFLICT DO NOTHING;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT ord.user_id, {ORDER_MONTH.format(alias='ord')}
+                FROM (SELECT DISTINCT order_id FROM old_rows) o
+                JOIN orders ord ON ord.id = o.order_id
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for table, function in (('orders', 'revenue_rollup_mark_orders'),
+                            ('order_products', 'revenue_rollup_mark_order_products')):
+        op.execute(f"""
+            CREATE TRIGGER {table}_rollup_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_rollup_update AFTER UPDATE ON {table}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_rollup_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+
+    # Все существующие месяцы помечаются к расчету при первом обновлении
+    op.execute(f"""
+        INSERT INTO revenue_rollup_dirty (user_id, month)
+        SELECT DISTINCT o.user_id, {ORDER_MONTH.format(alias='o')} FROM orders o
+    """)
+
+
+def downgrade() -> None:
+    for table in ('orders', 'order_products'):
+        for event in ('insert', 'update', 'delete'):
+            op.execute(f"DROP TRIGGER {table}_rollup_{event} ON {table}")
+    op.execute("DROP FUNCTION revenue_rollup_mark_order_products()")
+    op.execute("DROP FUNCTION revenue_rollup_mark_orders()")
+    op.drop_table('revenue_rollup_dirty')
+    op.drop_table('revenue_rollups')
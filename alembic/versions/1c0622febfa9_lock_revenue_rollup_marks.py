@@ -0,0 +1,79 @@
+"""Row-lock revenue rollup marks from the dirty-month triggers
+
+Revision ID: 1c0622febfa9
+Revises: 188cf141da1a
+Create Date: 2026-10-19 00:10:00.000000
+
+ON CONFLICT DO NOTHING не блокирует уже существующую метку. Пересчет мог
+забрать ее (FOR UPDATE SKIP LOCKED) до коммита пишущей транзакции и посчитать
+месяц без ее строк; после коммита метки уже не было, и месяц оставался
+неверным. ON CONFLICT DO UPDATE берет блокировку строки: пересчет пропускает
+метку, пока пишущая транзакция не завершится. Цена - одновременные записи
+одного пользователя за один месяц ждут друг друга на метке до коммита.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c0622febfa9'
+down_revision: Union[str, None] = '188cf141da1a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Месяц считается по UTC, как хранится created_at
+ORDER_MONTH = "date_trunc('month', {alias}.created_at AT TIME ZONE 'UTC')::date"
+
+LOCK_MARK = "ON CONFLICT (user_id, month) DO UPDATE SET month = EXCLUDED.month"
+SKIP_MARK = "ON CONFLICT DO NOTHING"
+
+
+def create_functions(on_conflict: str) -> None:
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION revenue_rollup_mark_orders() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT n.user_id, {ORDER_MONTH.format(alias='n')} FROM new_rows n
+                {on_conflict};
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT o.user_id, {ORDER_MONTH.format(alias='o')} FROM old_rows o
+                {on_conflict};
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION revenue_rollup_mark_order_products() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT ord.user_id, {ORDER_MONTH.format(alias='ord')}
+                FROM (SELECT DISTINCT order_id FROM new_rows) n
+                JOIN orders ord ON ord.id = n.order_id
+                {on_conflict};
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO revenue_rollup_dirty (user_id, month)
+                SELECT DISTINCT ord.user_id, {ORDER_MONTH.format(alias='ord')}
+                FROM (SELECT DISTINCT order_id FROM old_rows) o
+                JOIN orders ord ON ord.id = o.order_id
+                {on_conflict};
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+
+
+def upgrade() -> None:
+    # DISTINCT в выборках обязателен: DO UPDATE не может задеть одну строку дважды за оператор
+    create_functions(LOCK_MARK)
+
+
+def downgrade() -> None:
+    create_functions(SKIP_MARK)
@@ -0,0 +1,27 @@
+"""Count failed attempts on one-time passwords
+
+Revision ID: 3c95cae0f99f
+Revises: ec217131e243
+Create Date: 2026-10-18 23:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c95cae0f99f'
+down_revision: Union[str, None] = 'ec217131e243'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Постоянное значение по умолчанию не переписывает таблицу (PostgreSQL 11+)
+    op.add_column('one_time_passwords', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('one_time_passwords', 'attempts')
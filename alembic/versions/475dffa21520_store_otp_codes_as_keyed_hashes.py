@@ -0,0 +1,59 @@
+"""Store OTP codes as keyed hashes instead of plain integers
+
+Revision ID: 475dffa21520
+Revises: b4b227daa0a2
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+import hashlib
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '475dffa21520'
+down_revision: Union[str, None] = 'b4b227daa0a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Хэши считаются только для неиспользованных кодов за последние сутки: остальные
+# все равно не пройдут проверку. Ключ берется из AUTH_SECRET_KEY, поэтому
+# миграцию нужно запускать с тем же ключом, что и приложение.
+BACKFILL_WINDOW = "1 day"
+
+
+def hash_code(secret_key: bytes, phone_number: str, code: int) -> int:
+    # Копия app/otp.py на момент миграции: миграция не должна зависеть от текущего кода приложения
+    key = hashlib.blake2b(secret_key, digest_size=32, person=b"otp-code-hash").digest()
+    digest = hashlib.blake2b(f"{phone_number}:{code}".encode(), key=key, digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def upgrade() -> None:
+    op.add_column('one_time_passwords', sa.Column('code_hash', sa.BigInteger(), nullable=True))
+
+    connection = op.get_bind()
+    live = connection.execute(sa.text(f"""
+        SELECT id, phone_number, code FROM one_time_passwords
+        WHERE NOT is_used AND created_at > now() - interval '{BACKFILL_WINDOW}'
+    """)).all()
+    if live:
+        secret = os.getenv("AUTH_SECRET_KEY")
+        if not secret:
+            raise RuntimeError("AUTH_SECRET_KEY не задан: нужен тот же ключ, что и у приложения")
+        connection.execute(
+            sa.text("UPDATE one_time_passwords SET code_hash = :code_hash WHERE id = :id"),
+            [{"id": row.id, "code_hash": hash_code(secret.encode(), row.phone_number, row.code)} for row in live],
+        )
+
+    op.drop_column('one_time_passwords', 'code')
+
+
+def downgrade() -> None:
+    # Открытые коды не восстановить: старые строки получают 0 и больше не проходят
+    op.add_column('one_time_passwords', sa.Column('code', sa.Integer(), server_default='0', nullable=False))
+    op.alter_column('one_time_passwords', 'code', server_default=None)
+    op.drop_column('one_time_passwords', 'code_hash')
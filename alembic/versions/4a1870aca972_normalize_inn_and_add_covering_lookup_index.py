@@ -0,0 +1,58 @@
+"""Normalize INN storage and add covering (user_id, inn) index on customers
+
+Revision ID: 4a1870aca972
+Revises: 85df7a333a20
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a1870aca972'
+down_revision: Union[str, None] = '85df7a333a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INN_FORMAT = "inn ~ '^([0-9]{10}|[0-9]{12})$'"
+CHECKS = {
+    'users': 'ck_users_inn_digits',
+    'customers': 'ck_customers_inn_digits',
+}
+
+
+def upgrade() -> None:
+    # Пробелы, дефисы и прочие символы в уже сохраненных ИНН убираются.
+    # Если после этого у пользователя совпадут два заказчика, миграция упадет
+    # на uq_customer_inn_user: такие дубли нужно сначала объединить вручную.
+    for table, name in CHECKS.items():
+        op.execute(f"UPDATE {table} SET inn = regexp_replace(inn, '[^0-9]', '', 'g') WHERE inn ~ '[^0-9]'")
+        # NOT VALID не читает таблицу: ACCESS EXCLUSIVE держится только до коммита
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({INN_FORMAT}) NOT VALID")
+
+    with op.get_context().autocommit_block():
+        # autocommit_block сначала коммитит UPDATE и ADD CONSTRAINT. VALIDATE идет
+        # своей транзакцией под SHARE UPDATE EXCLUSIVE: чтение и запись не ждут,
+        # пока проверяются существующие строки
+        for table, name in CHECKS.items():
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+        op.create_index(
+            'ix_customers_user_inn',
+            'customers',
+            ['user_id', 'inn'],
+            unique=False,
+            postgresql_include=['id', 'name', 'customer_type'],
+            postgresql_concurrently=True,
+        )
+        # Поиск по ИНН всегда в пределах пользователя, одиночный индекс по inn не нужен
+        op.drop_index('ix_customers_inn', table_name='customers', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_customers_inn', 'customers', ['inn'], unique=False, postgresql_concurrently=True)
+        op.drop_index('ix_customers_user_inn', table_name='customers', postgresql_concurrently=True)
+    for table, name in CHECKS.items():
+        op.drop_constraint(name, table, type_='check')
@@ -0,0 +1,34 @@
+"""Add (user_id, created_at, id) index on orders
+
+Revision ID: 788fd95cc6b2
+Revises: 16ca87662db8
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '788fd95cc6b2'
+down_revision: Union[str, None] = '16ca87662db8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # id в конце индекса нужен для однозначного порядка при одинаковом created_at
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_orders_user_created',
+            'orders',
+            ['user_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_user_created', table_name='orders', postgresql_concurrently=True)
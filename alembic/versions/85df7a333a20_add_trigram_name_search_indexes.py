@@ -0,0 +1,47 @@
+"""Add trigram indexes for product and customer name search
+
+Revision ID: 85df7a333a20
+Revises: a494c1069bcd
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '85df7a333a20'
+down_revision: Union[str, None] = 'a494c1069bcd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'products': 'ix_products_user_name_trgm',
+    'customers': 'ix_customers_user_name_trgm',
+}
+
+
+def upgrade() -> None:
+    # pg_trgm дает оператор-класс для ILIKE '%...%', btree_gin позволяет
+    # положить user_id в тот же GIN-индекс, чтобы поиск не выходил за пользователя
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    with op.get_context().autocommit_block():
+        for table, name in INDEXES.items():
+            op.create_index(
+                name,
+                table,
+                ['user_id', 'name'],
+                unique=False,
+                postgresql_using='gin',
+                postgresql_ops={'name': 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    # Расширения остаются: их могут использовать и другие объекты базы
+    with op.get_context().autocommit_block():
+        for table, name in INDEXES.items():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
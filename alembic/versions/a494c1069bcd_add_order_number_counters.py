@@ -0,0 +1,36 @@
+"""Add per-user order number counters
+
+Revision ID: a494c1069bcd
+Revises: 1895e784ed59
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a494c1069bcd'
+down_revision: Union[str, None] = '1895e784ed59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('order_number_counters',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('last_number', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Счетчики продолжают уже выданные номера
+    op.execute("""
+        INSERT INTO order_number_counters (user_id, last_number)
+        SELECT user_id, MAX(number) FROM orders GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('order_number_counters')
@@ -0,0 +1,55 @@
+"""Normalize stored phone numbers to E.164
+
+Revision ID: b4b227daa0a2
+Revises: 4a1870aca972
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4b227daa0a2'
+down_revision: Union[str, None] = '4a1870aca972'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+E164 = r"'^\+[1-9][0-9]{7,14}$'"
+
+# Те же правила, что в app/phone.py (normalize_phone), на SQL; d - номер без нецифровых символов
+NORMALIZED = r"""
+    CASE
+        WHEN btrim(phone_number) LIKE '+%' THEN '+' || d
+        WHEN d LIKE '00%' THEN '+' || substr(d, 3)
+        WHEN length(d) = 11 AND left(d, 1) IN ('7', '8') THEN '+7' || substr(d, 2)
+        WHEN length(d) = 10 THEN '+7' || d
+        ELSE phone_number
+    END
+"""
+
+
+def backfill(table: str) -> None:
+    # Трогаются только строки не в E.164. Если у двух пользователей номера
+    # совпадут после нормализации, миграция упадет на уникальном индексе.
+    op.execute(f"""
+        UPDATE {table} t SET phone_number = {NORMALIZED}
+        FROM (SELECT id, regexp_replace(phone_number, '[^0-9]', '', 'g') AS d
+              FROM {table} WHERE phone_number !~ {E164}) n
+        WHERE t.id = n.id
+    """)
+
+
+def upgrade() -> None:
+    backfill('users')
+    backfill('one_time_passwords')
+    # NOT VALID: новые строки проверяются сразу, а старые номера, которые не удалось
+    # привести к E.164, не мешают миграции. После их ручной правки:
+    # ALTER TABLE users VALIDATE CONSTRAINT ck_users_phone_e164
+    op.execute(f"ALTER TABLE users ADD CONSTRAINT ck_users_phone_e164 CHECK (phone_number ~ {E164}) NOT VALID")
+
+
+def downgrade() -> None:
+    # Исходное написание номеров не сохраняется, откатывается только ограничение
+    op.drop_constraint('ck_users_phone_e164', 'users', type_='check')
@@ -0,0 +1,122 @@
+"""Drop indexes duplicating primary keys and composite prefixes
+
+Revision ID: d301383bcc0f
+Revises: 475dffa21520
+Create Date: 2026-10-18 23:00:00.000000
+
+Найдены scripts/audit_indexes.py. Индексы ix_<таблица>_id повторяли первичные
+ключи и удваивали запись индексов на каждую вставку. Остальные удаляемые
+индексы совпадают с началом составных. Уникальность ИНН заказчика переезжает
+в покрывающий индекс (user_id, inn) INCLUDE (...), отдельный ix_customers_user_inn
+больше не нужен.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd301383bcc0f'
+down_revision: Union[str, None] = '475dffa21520'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> индекс и его колонки (для отката)
+REDUNDANT = [
+    ('users', 'ix_users_id', ['id']),
+    ('products', 'ix_products_id', ['id']),
+    ('customers', 'ix_customers_id', ['id']),
+    ('orders', 'ix_orders_id', ['id']),
+    ('order_products', 'ix_order_products_id', ['id']),
+    # (user_id, inn) INCLUDE (...)
+    ('customers', 'ix_customers_user_id', ['user_id']),
+    # uq_order_number_user (number, user_id)
+    ('orders', 'ix_orders_number', ['number']),
+    # ix_orders_user_created (user_id, created_at, id)
+    ('orders', 'ix_orders_user_id', ['user_id']),
+    # ix_orders_customer_created (customer_id, created_at)
+    ('orders', 'ix_orders_customer_id', ['customer_id']),
+]
+# Коды ищутся только среди неиспользованных, по частичному
+# ix_one_time_passwords_phone_created_unused
+OTP_REDUNDANT = [
+    ('one_time_passwords', 'ix_one_time_passwords_id', ['id']),
+    ('one_time_passwords', 'ix_one_time_passwords_phone_number', ['phone_number']),
+]
+CUSTOMER_INN_INCLUDE = ['id', 'name', 'customer_type']
+
+
+def is_partitioned(connection) -> bool:
+    return connection.execute(sa.text("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = 'one_time_passwords' AND pg_table_is_visible(c.oid)
+        )
+    """)).scalar()
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не поддерживается для секционированной таблицы
+    otp_concurrently = not is_partitioned(op.get_bind())
+
+    with op.get_context().autocommit_block():
+        # Заказы заказчика в отчетах идут от новых к старым; индекс заодно
+        # обслуживает ON DELETE CASCADE со стороны customers
+        op.create_index(
+            'ix_orders_customer_created',
+            'orders',
+            ['customer_id', 'created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'uq_customers_user_inn',
+            'customers',
+            ['user_id', 'inn'],
+            unique=True,
+            postgresql_include=CUSTOMER_INN_INCLUDE,
+            postgresql_concurrently=True,
+        )
+
+    # Замена ограничения одной командой: уникальность не пропадает ни на миг.
+    # Индекс при этом получает имя ограничения.
+    op.execute(
+        "ALTER TABLE customers DROP CONSTRAINT uq_customer_inn_user, "
+        "ADD CONSTRAINT uq_customer_inn_user UNIQUE USING INDEX uq_customers_user_inn"
+    )
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_customers_user_inn', table_name='customers', postgresql_concurrently=True)
+        for table, name, _ in REDUNDANT:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+        for table, name, _ in OTP_REDUNDANT:
+            op.drop_index(name, table_name=table, postgresql_concurrently=otp_concurrently)
+
+
+def downgrade() -> None:
+    otp_concurrently = not is_partitioned(op.get_bind())
+
+    with op.get_context().autocommit_block():
+        for table, name, columns in OTP_REDUNDANT:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=otp_concurrently)
+        for table, name, columns in REDUNDANT:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True)
+        op.create_index(
+            'ix_customers_user_inn',
+            'customers',
+            ['user_id', 'inn'],
+            unique=False,
+            postgresql_include=CUSTOMER_INN_INCLUDE,
+            postgresql_concurrently=True,
+        )
+        op.create_index('uq_customers_inn_user', 'customers', ['inn', 'user_id'], unique=True, postgresql_concurrently=True)
+
+    op.execute(
+        "ALTER TABLE customers DROP CONSTRAINT uq_customer_inn_user, "
+        "ADD CONSTRAINT uq_customer_inn_user UNIQUE USING INDEX uq_customers_inn_user"
+    )
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_orders_customer_created', table_name='orders', postgresql_concurrently=True)
@@ -0,0 +1,40 @@
+"""Add partial index for OTP verification
+
+Revision ID: d60e8cc5d4e5
+Revises: 082450edab94
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd60e8cc5d4e5'
+down_revision: Union[str, None] = '082450edab94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в растущую таблицу, но не работает в транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_one_time_passwords_phone_created_unused',
+            'one_time_passwords',
+            ['phone_number', 'created_at'],
+            unique=False,
+            postgresql_where=sa.text('NOT is_used'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_one_time_passwords_phone_created_unused',
+            table_name='one_time_passwords',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """Локальный кэш процесса: LRU с ограничением размера и временем жизни записи"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=_MISSING):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key) -> None:
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class SharedCache(ABC):
+    """Общий кэш между процессами (необязательный второй уровень)"""
+
+    @abstractmethod
+    async def get(self, key: str):
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+
+class RedisCache(SharedCache):
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str):
+        raw = await self._client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value, ttl: float) -> None:
+        await self._client.set(key, json.dumps(value, default=str), ex=int(ttl))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.delete(*keys)
+
+
+def create_shared_cache() -> SharedCache | None:
+    url = os.getenv("CACHE_REDIS_URL")
+    if not url:
+        return None
+    try:
+        return RedisCache(url)
+    except ImportError:
+        logger.warning("CACHE_REDIS_URL задан, но пакет redis не установлен; общий кэш выключен")
+        return None
+
+
+class UserCache:
+    """Сквозной кэш профилей пользователей по id
+
+    Локальный уровень живет недолго (USER_CACHE_TTL_SECONDS), поэтому изменения,
+    сделанные другими процессами без общего уровня, видны не позже чем через TTL.
+    Клиент общего кэша асинхронный и привязан к циклу событий приложения, поэтому
+    сброс после commit планируется только в этот цикл (bind_loop при старте).
+    """
+
+    def __init__(self, local: LRUTTLCache, shared: SharedCache | None = None, shared_ttl: float = 300):
+        self.local = local
+        self.shared = shared
+        self.shared_ttl = shared_ttl
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop | None) -> None:
+        self._loop = loop
+
+    @staticmethod
+    def shared_key(user_id) -> str:
+        return f"user:{user_id}"
+
+    async def get(self, user_id, loader):
+        value = self.local.get(user_id)
+        if value is not _MISSING:
+            return value
+
+        if self.shared is not None:
+            try:
+                value = await self.shared.get(self.shared_key(user_id))
+            except Exception:
+                logger.exception("Ошибка чтения общего кэша")
+                value = None
+            if value is not None:
+                self.shared_hits += 1
+                self.local.set(user_id, value)
+                return value
+            self.shared_misses += 1
+
+        value = await loader(user_id)
+        if value is not None:
+            self.local.set(user_id, value)
+            if self.shared is not None:
+                try:
+                    await self.shared.set(self.shared_key(user_id), value, self.shared_ttl)
+                except Exception:
+                    logger.exception("Ошибка записи в общий кэш")
+        return value
+
+    def invalidate(self, user_ids) -> None:
+        for user_id in user_ids:
+            self.local.delete(user_id)
+        if self.shared is not None and user_ids:
+            loop = self._loop
+            if loop is None or not loop.is_running():
+                # Вне приложения (скрипты, синхронные сессии без сервера) общий уровень доживает свой TTL
+                logger.warning("Общий кэш не сброшен: цикл событий приложения не запущен")
+                return
+            # commit может прийти из потока пула (синхронная сессия) или из самого цикла
+            future = asyncio.run_coroutine_threadsafe(
+                self.shared.delete(*(self.shared_key(user_id) for user_id in user_ids)), loop
+            )
+            future.add_done_callback(_log_invalidation_error)
+
+    def invalidate_all(self) -> None:
+        # Массовый UPDATE/DELETE: id неизвестны, сбрасывается локальный уровень,
+        # общий доживает свой TTL
+        self.local.clear()
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        stats["shared_hits"] = self.shared_hits
+        stats["shared_misses"] = self.shared_misses
+        return stats
+
+
+def _log_invalidation_error(future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Ошибка инвалидации общего кэша: %s", future.exception())
+
+
+user_cache = UserCache(
+    LRUTTLCache(
+        maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "30")),
+    ),
+    shared=create_shared_cache(),
+)
+
+
+# Инвалидация по событиям сессии: id измененных и удаленных User копятся при flush
+# и сбрасываются из кэша только после commit, откат их просто забывает
+
+_PENDING_KEY = "user_cache_pending"
+_ALL = object()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = [obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_changes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper is not None:
+        if orm_execute_state.bind_mapper.class_ is User:
+            orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(_ALL)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _ALL in pending:
+        user_cache.invalidate_all()
+        pending.discard(_ALL)
+    user_cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending_users(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,30 @@
+from uuid import UUID
+
+from sqlalchemy import select
+
+from .models import Customer
+
+MAX_LOOKUP_INNS = 1000
+
+
+def inn_lookup_statement(user_id: UUID, inns: list[str]):
+    """Заказчики пользователя по нормализованным ИНН
+
+    Все выбранные колонки есть в uq_customer_inn_user, поэтому Postgres
+    отвечает index-only scan без чтения таблицы (после VACUUM).
+    """
+    return select(Customer.id, Customer.inn, Customer.name, Customer.customer_type).where(
+        Customer.user_id == user_id, Customer.inn.in_(inns)
+    )
+
+
+async def lookup_customers(executor, user_id: UUID, inns) -> dict[str, dict]:
+    """Один запрос на любое число ИНН; executor - AsyncSession или AsyncConnection"""
+    inns = list(set(inns))
+    if not inns:
+        return {}
+    rows = await executor.execute(inn_lookup_statement(user_id, inns))
+    return {
+        inn: {"id": customer_id, "name": name, "inn": inn, "customer_type": customer_type.value}
+        for customer_id, inn, name, customer_type in rows
+    }
@@ -1,12 +1,66 @@
 from sqlalchemy import create_engine 
 from sqlalchemy.orm import sessionmaker, declarative_base 
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from dotenv import load_dotenv 
 import os 
 
+from .pool_stats import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+
 load_dotenv() 
 
 DATABASE_URL = os.getenv("DATABASE_URL") 
 
-engine = create_engine(DATABASE_URL, echo=True) 
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Параметры пула соединений (значения по умолчанию совпадают с QueuePool)
+DB_ECHO = env_bool("DB_ECHO", False)
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", -1)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", False)
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+
+def to_async_url(url: str) -> str:
+    """Переводит синхронный URL (psycopg2) на асинхронный драйвер asyncpg"""
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme:
+        scheme = scheme.split("+", 1)[0]
+    if scheme == "postgres":
+        scheme = "postgresql"
+    return f"{scheme}+asyncpg{sep}{rest}"
+
+
+# Асинхронный URL можно задать явно, иначе он выводится из DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (DATABASE_URL and to_async_url(DATABASE_URL))
+
+# Синхронный движок остается для Alembic и скриптов
+engine = create_engine(DATABASE_URL, echo=DB_ECHO, poolclass=InstrumentedQueuePool, **POOL_OPTIONS) 
 SessionLocal = sessionmaker(bind=engine) 
+
+# Асинхронный движок для обработчиков FastAPI
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, echo=DB_ECHO, poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 Base = declarative_base()
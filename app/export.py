@@ -0,0 +1,172 @@
+import csv
+import io
+import zipfile
+from datetime import datetime, timezone
+from typing import AsyncIterator
+from uuid import UUID
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import Customer, Order, OrderProduct, Product
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_BATCH = 2000
+
+HEADER = ("Номер заказа", "Дата", "Заказчик", "ИНН заказчика", "Услуга", "Количество", "Цена", "Сумма")
+
+
+def export_statement(user_id: UUID, date_from: datetime | None = None, date_to: datetime | None = None):
+    """Позиции заказов пользователя плоскими строками, без ORM-объектов"""
+    statement = (
+        select(
+            Order.number,
+            Order.created_at,
+            Customer.name,
+            Customer.inn,
+            Product.name,
+            OrderProduct.quantity,
+            OrderProduct.price,
+            (OrderProduct.quantity * OrderProduct.price).label("total"),
+        )
+        .select_from(Order)
+        .join(Customer, Customer.id == Order.customer_id)
+        .join(OrderProduct, OrderProduct.order_id == Order.id)
+        .join(Product, Product.id == OrderProduct.product_id)
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at, Order.number)
+    )
+    if date_from is not None:
+        statement = statement.where(Order.created_at >= date_from)
+    if date_to is not None:
+        statement = statement.where(Order.created_at < date_to)
+    return statement
+
+
+def year_range(year: int) -> tuple[datetime, datetime]:
+    return datetime(year, 1, 1, tzinfo=timezone.utc), datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+
+
+async def iter_batches(engine: AsyncEngine, statement, batch_size: int = EXPORT_BATCH) -> AsyncIterator[list]:
+    """Читает результат серверным курсором пачками по batch_size строк
+
+    Соединение открывается здесь, а не берется из зависимости запроса: ответ
+    отдается потоком уже после выхода из обработчика.
+    """
+    async with engine.connect() as connection:
+        result = await connection.stream(statement.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
+
+
+async def csv_chunks(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM, чтобы Excel открыл UTF-8 без мастера импорта
+    buffer.write("\ufeff")
+    writer.writerow(HEADER)
+    async for rows in batches:
+        for number, created_at, customer, inn, product, quantity, price, total in rows:
+            writer.writerow((number, created_at.isoformat(), customer, inn, product, quantity, price, total))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Приемник для ZipFile без seek: накопленные байты забираются после каждой пачки"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Заказы" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values) -> str:
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) or hasattr(value, "as_tuple"):
+            cells.append(f"<c><v>{value}</v></c>")
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+async def xlsx_chunks(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """Минимальный XLSX, который пишется потоком: лист собирается строками inlineStr
+    прямо в zip без перемотки, поэтому в памяти держится только текущая пачка"""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(HEADER).encode())
+            yield sink.drain()
+            async for rows in batches:
+                sheet.write("".join(
+                    _xlsx_row((number, created_at.isoformat(), customer, inn, product, quantity, price, total))
+                    for number, created_at, customer, inn, product, quantity, price, total in rows
+                ).encode())
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .cache import LRUTTLCache
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+# Сколько помнить ключ: повтор позже этого срока создаст новый заказ
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "0"))
+
+LOAD_SQL = text("""
+    SELECT request_hash, status_code, response FROM idempotency_keys
+    WHERE user_id = :user_id AND key = :key AND created_at > :expired_before
+""")
+
+SAVE_SQL = text("""
+    UPDATE idempotency_keys SET status_code = :status_code, response = :response
+    WHERE user_id = :user_id AND key = :key
+""")
+
+PURGE_SQL = text("DELETE FROM idempotency_keys WHERE created_at < :expired_before")
+
+
+class IdempotencyError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    request_hash: bytes
+    status_code: int
+    body: bytes
+
+
+def request_fingerprint(content) -> bytes:
+    """Хэш тела запроса: тот же ключ с другим телом - ошибка клиента, а не повтор"""
+    return hashlib.sha256(dumps(content)).digest()
+
+
+def expired_before(now: datetime | None = None) -> datetime:
+    return (now or datetime.now(timezone.utc)) - IDEMPOTENCY_KEY_TTL
+
+
+async def load_stored(connection, user_id: UUID, key: str) -> StoredResponse | None:
+    row = (await connection.execute(
+        LOAD_SQL, {"user_id": user_id, "key": key, "expired_before": expired_before()}
+    )).first()
+    if row is None or row.status_code is None:
+        return None
+    return StoredResponse(row.request_hash, row.status_code, row.response)
+
+
+async def save_response(connection, user_id: UUID, key: str, response: StoredResponse) -> None:
+    await connection.execute(
+        SAVE_SQL, {"user_id": user_id, "key": key, "status_code": response.status_code, "response": response.body}
+    )
+
+
+def check_replay(stored: StoredResponse, request_hash: bytes) -> StoredResponse:
+    if stored.request_hash != request_hash:
+        raise IdempotencyError("Ключ Idempotency-Key уже использован с другим запросом")
+    return stored
+
+
+class ResponseCache:
+    """Сохраненные ответы в памяти процесса, ключ - (user_id, Idempotency-Key)
+
+    Повтор, попавший в кэш, не обращается к базе вовсе. Промах не страшен:
+    таблица idempotency_keys - источник истины для всех процессов.
+    """
+
+    def __init__(self, local: LRUTTLCache):
+        self.local = local
+
+    def get(self, user_id: UUID, key: str) -> StoredResponse | None:
+        return self.local.get((user_id, key), None)
+
+    def set(self, user_id: UUID, key: str, response: StoredResponse) -> None:
+        self.local.set((user_id, key), response)
+
+    def stats(self) -> dict:
+        return self.local.stats()
+
+
+response_cache = ResponseCache(
+    LRUTTLCache(
+        maxsize=int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+        # Запись в кэше не должна пережить строку в таблице
+        ttl=min(float(os.getenv("IDEMPOTENCY_CACHE_TTL_SECONDS", "600")), IDEMPOTENCY_KEY_TTL.total_seconds()),
+    )
+)
+
+
+async def purge_expired_keys(engine: AsyncEngine) -> int:
+    async with engine.begin() as connection:
+        result = await connection.execute(PURGE_SQL, {"expired_before": expired_before()})
+    return result.rowcount
+
+
+async def run_periodically(engine: AsyncEngine, interval: float) -> None:
+    while True:
+        try:
+            deleted = await purge_expired_keys(engine)
+            if deleted:
+                logger.info("Удалено устаревших ключей идемпотентности: %s", deleted)
+        except Exception:
+            logger.exception("Ошибка очистки ключей идемпотентности")
+        await asyncio.sleep(interval)
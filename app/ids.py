@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+from uuid import UUID
+
+# Раскладка UUIDv7 (RFC 9562): 48 бит - миллисекунды Unix, 4 бита версии,
+# 12 бит счетчика внутри миллисекунды, 2 бита варианта, 62 случайных бита
+_COUNTER_MAX = 0xFFF
+_VERSION_7 = 0x7 << 76
+_VARIANT = 0b10 << 62
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> UUID:
+    """Идентификатор, возрастающий со временем создания
+
+    Новые ключи попадают в правый край B-дерева первичного ключа, а не в
+    случайную страницу, как у uuid4: меньше расщеплений страниц и горячих
+    страниц в кэше. В пределах процесса значения строго возрастают; при
+    переполнении счетчика или переводе часов назад время берется от
+    предыдущего значения. Тип колонки тот же (uuid), старые uuid4 остаются
+    валидными и просто сортируются вперемешку с новыми.
+    """
+    global _last_ms, _counter
+    tail = int.from_bytes(os.urandom(8)) & 0x3FFF_FFFF_FFFF_FFFF
+    now_ms = time.time_ns() // 1_000_000
+    with _lock:
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # Случайное начало счетчика, половина диапазона остается на рост
+            _counter = tail >> 51
+        elif _counter < _COUNTER_MAX:
+            _counter += 1
+        else:
+            _last_ms += 1
+            _counter = 0
+        ms, counter = _last_ms, _counter
+    return uuid7_from(ms, counter, tail)
+
+
+def uuid7_from(ms: int, counter: int, tail: int) -> UUID:
+    """UUIDv7 из готовых полей: миллисекунд Unix, 12-битного счетчика и 62 случайных бит
+
+    Нужен там, где время и случайная часть задаются извне, например в
+    детерминированном генераторе данных (scripts/generate_data.py).
+    """
+    value = (
+        (ms & 0xFFFF_FFFF_FFFF) << 80 | _VERSION_7 | (counter & _COUNTER_MAX) << 64
+        | _VARIANT | tail & 0x3FFF_FFFF_FFFF_FFFF
+    )
+    return UUID(int=value)
+
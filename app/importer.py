@@ -0,0 +1,262 @@
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Iterable, Iterator
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .customers import lookup_customers
+from .database import env_int
+from .ids import uuid7
+from .inn import normalize_inn
+from .models import MAX_QUANTITY, Order, OrderProduct
+from .numbering import allocate_order_numbers
+
+IMPORT_FORMATS = ("csv", "ndjson")
+CHUNK_SIZE = 10_000
+# Предел размера файла, принимаемого через POST /orders/import
+IMPORT_MAX_BYTES = env_int("IMPORT_MAX_BYTES", 100 * 1024 * 1024)
+
+ORDER_COLUMNS = ("id", "number", "created_at", "customer_id", "user_id")
+ITEM_COLUMNS = ("id", "quantity", "price", "order_id", "product_id")
+
+OWNED_CUSTOMERS_SQL = text("SELECT id FROM customers WHERE user_id = :user_id AND id = ANY(CAST(:ids AS uuid[]))")
+OWNED_PRODUCTS_SQL = text("SELECT id FROM products WHERE user_id = :user_id AND id = ANY(CAST(:ids AS uuid[]))")
+
+
+class OrderImportError(ValueError):
+    def __init__(self, message: str, line: int | None = None):
+        self.line = line
+        super().__init__(f"строка {line}: {message}" if line is not None else message)
+
+
+@dataclass(slots=True)
+class ImportLine:
+    line: int
+    order_ref: str
+    created_at: datetime
+    customer_id: UUID | None
+    customer_inn: str | None
+    product_id: UUID
+    quantity: int
+    price: Decimal
+
+
+@dataclass
+class ImportResult:
+    orders: int = 0
+    items: int = 0
+    first_number: int | None = None
+    last_number: int | None = None
+
+
+# Заказчики и товары повторяются из строки в строку, разбор UUID кэшируется
+parse_uuid = lru_cache(maxsize=65536)(UUID)
+
+
+def parse_line(line: int, record: dict) -> ImportLine:
+    """Проверяет одну строку файла: заказ, дата, заказчик, товар, количество, цена
+
+    Заказчик задается либо customer_id, либо customer_inn (ИНН в любом написании).
+    """
+    try:
+        order_ref = str(record["order_ref"]).strip()
+        created_at = datetime.fromisoformat(str(record["created_at"]).strip())
+        customer_id = customer_inn = None
+        if str(record.get("customer_id") or "").strip():
+            customer_id = parse_uuid(str(record["customer_id"]).strip())
+        elif str(record.get("customer_inn") or "").strip():
+            customer_inn = normalize_inn(record["customer_inn"])
+        else:
+            raise KeyError("customer_id")
+        product_id = parse_uuid(str(record["product_id"]).strip())
+        quantity = int(record["quantity"])
+        price = Decimal(str(record["price"]).strip().replace(",", "."))
+    except KeyError as error:
+        raise OrderImportError(f"нет поля {error.args[0]}", line)
+    except (ValueError, TypeError, InvalidOperation) as error:
+        raise OrderImportError(f"некорректное значение ({error})", line)
+
+    if not order_ref:
+        raise OrderImportError("пустой order_ref", line)
+    if not 0 < quantity <= MAX_QUANTITY:
+        raise OrderImportError(f"количество должно быть от 1 до {MAX_QUANTITY}", line)
+    if price < 0 or price != price.quantize(Decimal("0.01")) or price >= Decimal("1e8"):
+        raise OrderImportError("цена должна быть неотрицательной, не больше 8 знаков до запятой и 2 после", line)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return ImportLine(line, order_ref, created_at, customer_id, customer_inn, product_id, quantity, price)
+
+
+def parse_csv(stream: Iterable[str]) -> Iterator[ImportLine]:
+    """CSV с заголовком: order_ref,created_at,customer_id,product_id,quantity,price
+
+    Вместо customer_id можно передать колонку customer_inn.
+    """
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield parse_line(reader.line_num, record)
+
+
+def parse_ndjson(stream: Iterable[str]) -> Iterator[ImportLine]:
+    """По одному JSON-объекту на строку с теми же полями, что и в CSV"""
+    for number, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+        except json.JSONDecodeError as error:
+            raise OrderImportError(f"некорректный JSON ({error.msg})", number)
+        if not isinstance(record, dict):
+            raise OrderImportError("ожидался JSON-объект", number)
+        yield parse_line(number, record)
+
+
+def parse_stream(stream: Iterable[str], file_format: str) -> Iterator[ImportLine]:
+    if file_format == "csv":
+        return parse_csv(stream)
+    if file_format == "ndjson":
+        return parse_ndjson(stream)
+    raise OrderImportError(f"формат должен быть одним из {IMPORT_FORMATS}")
+
+
+def text_stream(binary) -> io.TextIOWrapper:
+    return io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+
+
+def count_orders(binary, file_format: str) -> int:
+    """Первый проход по файлу: проверяет все строки и считает заказы (разные order_ref)
+
+    Файл после прохода перематывается в начало и остается открытым.
+    """
+    stream = text_stream(binary)
+    try:
+        return len({line.order_ref for line in parse_stream(stream, file_format)})
+    finally:
+        stream.detach()
+        binary.seek(0)
+
+
+def chunked(lines: Iterator[ImportLine], size: int) -> Iterator[list[ImportLine]]:
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def copy_rows(connection: AsyncConnection, table, columns: tuple[str, ...], records: list[tuple]) -> None:
+    """COPY через asyncpg; для других драйверов - многострочный INSERT"""
+    if not records:
+        return
+    raw = await connection.get_raw_connection()
+    driver = raw.driver_connection
+    if hasattr(driver, "copy_records_to_table"):
+        await driver.copy_records_to_table(table.name, records=records, columns=columns)
+    else:
+        await connection.execute(table.insert(), [dict(zip(columns, record)) for record in records])
+
+
+async def check_ownership(connection: AsyncConnection, user_id: UUID, query, ids: set[UUID], what: str) -> None:
+    owned = {row[0] for row in await connection.execute(query, {"user_id": user_id, "ids": list(ids)})}
+    missing = ids - owned
+    if missing:
+        sample = ", ".join(str(value) for value in list(missing)[:5])
+        raise OrderImportError(f"{what} не найдены или принадлежат другому пользователю: {sample}")
+
+
+async def resolve_inns(connection: AsyncConnection, user_id: UUID, chunk: list[ImportLine], known: dict[str, UUID]) -> None:
+    """Проставляет customer_id строкам с customer_inn: новые ИНН пачки - одним запросом"""
+    unresolved = {line.customer_inn for line in chunk if line.customer_id is None} - known.keys()
+    if unresolved:
+        found = await lookup_customers(connection, user_id, unresolved)
+        missing = unresolved - found.keys()
+        if missing:
+            sample = ", ".join(sorted(missing)[:5])
+            raise OrderImportError(f"заказчики с ИНН не найдены: {sample}")
+        known.update((inn, customer["id"]) for inn, customer in found.items())
+    for line in chunk:
+        if line.customer_id is None:
+            line.customer_id = known[line.customer_inn]
+
+
+async def import_orders(
+    connection: AsyncConnection,
+    user_id: UUID,
+    lines: Iterable[ImportLine],
+    numbers: Iterable[int],
+    chunk_size: int = CHUNK_SIZE,
+) -> ImportResult:
+    """Загружает заказы и позиции пачками через COPY в текущей транзакции
+
+    Строки с одинаковым order_ref образуют один заказ (дата и заказчик берутся
+    из первой строки) и получают очередной номер из numbers. Принадлежность
+    заказчиков и товаров пользователю проверяется одним запросом на пачку. При
+    любой ошибке вызывающий код откатывает транзакцию целиком. Разбор строк
+    идет в пуле потоков, цикл событий ждет только базу.
+    """
+    result = ImportResult()
+    orders: dict[str, UUID] = {}
+    known_customers: set[UUID] = set()
+    known_products: set[UUID] = set()
+    customers_by_inn: dict[str, UUID] = {}
+    numbers = iter(numbers)
+    chunks = chunked(iter(lines), chunk_size)
+
+    while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+        await resolve_inns(connection, user_id, chunk, customers_by_inn)
+        # Найденные по ИНН заказчики уже ограничены пользователем
+        known_customers.update(customers_by_inn.values())
+        new_customers = {line.customer_id for line in chunk} - known_customers
+        if new_customers:
+            await check_ownership(connection, user_id, OWNED_CUSTOMERS_SQL, new_customers, "заказчики")
+            known_customers |= new_customers
+        new_products = {line.product_id for line in chunk} - known_products
+        if new_products:
+            await check_ownership(connection, user_id, OWNED_PRODUCTS_SQL, new_products, "товары")
+            known_products |= new_products
+
+        order_records = []
+        item_records = []
+        for line in chunk:
+            order_id = orders.get(line.order_ref)
+            if order_id is None:
+                order_id = uuid7()
+                orders[line.order_ref] = order_id
+                number = next(numbers)
+                order_records.append((order_id, number, line.created_at, line.customer_id, user_id))
+                if result.first_number is None:
+                    result.first_number = number
+                result.last_number = number
+            item_records.append((uuid7(), line.quantity, line.price, order_id, line.product_id))
+
+        await copy_rows(connection, Order.__table__, ORDER_COLUMNS, order_records)
+        await copy_rows(connection, OrderProduct.__table__, ITEM_COLUMNS, item_records)
+        result.orders += len(order_records)
+        result.items += len(item_records)
+
+    return result
+
+
+async def import_file(engine: AsyncEngine, user_id: UUID, binary, file_format: str) -> ImportResult:
+    """Импорт файла целиком: проверка, номера заказов, затем загрузка одной транзакцией
+
+    Номера выдаются до открытия транзакции импорта: allocate_order_numbers
+    фиксирует их своим соединением, и внутри импорта второе соединение из пула
+    не нужно. Файл поэтому читается дважды, зато ошибка в любой строке
+    находится до обращения к базе. Номера при откате импорта не возвращаются.
+    """
+    count = await run_in_threadpool(count_orders, binary, file_format)
+    numbers = await allocate_order_numbers(engine, user_id, count) if count else range(0)
+    async with engine.begin() as connection:
+        return await import_orders(connection, user_id, parse_stream(text_stream(binary), file_format), numbers)
@@ -0,0 +1,141 @@
+from dataclasses import dataclass
+
+from sqlalchemy import MetaData, PrimaryKeyConstraint, UniqueConstraint, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Индексы текущей схемы с числом сканирований и размером. Для секционированных
+# таблиц (one_time_passwords) статистика и размер суммируются по секциям
+# через pg_partition_tree, сами секции в отчет не попадают.
+LIVE_INDEXES_SQL = text("""
+    SELECT t.relname AS table_name,
+           i.relname AS index_name,
+           am.amname AS method,
+           ix.indisprimary AS is_primary,
+           ix.indisunique AS is_unique,
+           EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = ix.indexrelid) AS is_constraint,
+           ARRAY(SELECT pg_get_indexdef(ix.indexrelid, k, true)
+                 FROM generate_series(1, ix.indnkeyatts) AS k ORDER BY k) AS key_columns,
+           ARRAY(SELECT pg_get_indexdef(ix.indexrelid, k, true)
+                 FROM generate_series(ix.indnkeyatts + 1, ix.indnatts) AS k ORDER BY k) AS include_columns,
+           ix.indclass::text AS opclasses,
+           pg_get_expr(ix.indpred, ix.indrelid) AS predicate,
+           (SELECT coalesce(sum(s.idx_scan), 0)
+            FROM pg_partition_tree(ix.indexrelid) p
+            JOIN pg_stat_user_indexes s ON s.indexrelid = p.relid) AS scans,
+           (SELECT coalesce(sum(pg_relation_size(p.relid)), 0)
+            FROM pg_partition_tree(ix.indexrelid) p) AS size_bytes
+    FROM pg_index ix
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_am am ON am.oid = i.relam
+    WHERE n.nspname = current_schema()
+      AND t.relkind IN ('r', 'p')
+      AND NOT t.relispartition
+      AND t.relname <> 'alembic_version'
+    ORDER BY t.relname, i.relname
+""")
+
+# С какого момента копятся счетчики idx_scan
+STATS_SINCE_SQL = text("""
+    SELECT coalesce(
+        (SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()),
+        pg_postmaster_start_time()
+    )
+""")
+
+
+@dataclass(slots=True)
+class LiveIndex:
+    table_name: str
+    index_name: str
+    method: str
+    is_primary: bool
+    is_unique: bool
+    is_constraint: bool
+    key_columns: list[str]
+    include_columns: list[str]
+    opclasses: str
+    predicate: str | None
+    scans: int
+    size_bytes: int
+
+    @property
+    def enforces(self) -> bool:
+        # Первичные ключи и уникальность нельзя удалить, даже если по ним не ищут
+        return self.is_primary or self.is_unique
+
+    def covers(self, other: "LiveIndex") -> bool:
+        """Запросы, которые может обслужить other, обслужит и этот индекс"""
+        if (self.table_name, self.method, self.predicate) != (other.table_name, other.method, other.predicate):
+            return False
+        keys = len(other.key_columns)
+        if self.key_columns[:keys] != other.key_columns:
+            return False
+        # Для btree годится совпадение по префиксу, для остальных методов - только полное
+        if keys < len(self.key_columns) and self.method != "btree":
+            return False
+        if self.opclasses.split()[:keys] != other.opclasses.split():
+            return False
+        return set(other.include_columns) <= set(self.key_columns) | set(self.include_columns)
+
+
+async def live_indexes(connection: AsyncConnection) -> list[LiveIndex]:
+    rows = (await connection.execute(LIVE_INDEXES_SQL)).mappings().all()
+    return [LiveIndex(**row) for row in rows]
+
+
+def declared_index_names(metadata: MetaData) -> dict[str, set[str]]:
+    """Таблица -> имена индексов, которые создадут модели (вместе с PK и UNIQUE)"""
+    declared: dict[str, set[str]] = {}
+    for table in metadata.sorted_tables:
+        names = declared.setdefault(table.name, set())
+        names.update(index.name for index in table.indexes)
+        for constraint in table.constraints:
+            columns = "_".join(column.name for column in constraint.columns)
+            if isinstance(constraint, PrimaryKeyConstraint):
+                names.add(constraint.name or f"{table.name}_pkey")
+            elif isinstance(constraint, UniqueConstraint):
+                names.add(constraint.name or f"{table.name}_{columns}_key")
+    return declared
+
+
+def find_redundant(indexes: list[LiveIndex]) -> list[tuple[LiveIndex, LiveIndex]]:
+    """Пары (лишний, покрывающий): копии и btree-индексы, совпадающие с началом другого
+
+    Индекс с ограничением лишним не считается, кроме точной копии другого
+    ограничения. Из двух одинаковых оставляется ограничение, затем имя по алфавиту.
+    """
+    redundant = []
+    for index in indexes:
+        if index.is_primary:
+            continue
+        for other in indexes:
+            if other is index or not other.covers(index):
+                continue
+            exact = other.key_columns == index.key_columns
+            if index.enforces and not (exact and other.enforces and other.is_unique == index.is_unique):
+                continue
+            if exact and index.covers(other):
+                keep_other = (other.is_primary, other.is_constraint, index.index_name) > (
+                    index.is_primary, index.is_constraint, other.index_name
+                )
+                if not keep_other:
+                    continue
+            redundant.append((index, other))
+            break
+    return redundant
+
+
+def find_unused(indexes: list[LiveIndex], max_scans: int = 0) -> list[LiveIndex]:
+    return [index for index in indexes if not index.enforces and index.scans <= max_scans]
+
+
+def compare_declared(indexes: list[LiveIndex], metadata: MetaData) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """(объявлены в моделях, но нет в базе; есть в базе, но не объявлены)"""
+    declared = declared_index_names(metadata)
+    live = {(index.table_name, index.index_name) for index in indexes}
+    expected = {(table, name) for table, names in declared.items() for name in names}
+    return sorted(expected - live), sorted(
+        (table, name) for table, name in live - expected if table in declared
+    )
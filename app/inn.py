@@ -0,0 +1,58 @@
+import re
+
+# Веса контрольных цифр ИНН (приказ ФНС): для 10 знаков одна контрольная цифра,
+# для 12 знаков две - по первым 10 и по первым 11 цифрам
+WEIGHTS_10 = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+WEIGHTS_11 = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+WEIGHTS_12 = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+
+# Группа цифр, внутри которой допускаются пробелы и дефисы: «7707 083893», «77-07-083893»
+_DIGIT_RUN = re.compile(r"\d(?:[\d \t -]*\d)?")
+
+
+class InnError(ValueError):
+    pass
+
+
+def check_digit(digits: str, weights: tuple[int, ...]) -> str:
+    return str(sum(int(digit) * weight for digit, weight in zip(digits, weights)) % 11 % 10)
+
+
+def with_check_digits(body: str) -> str:
+    """Дописывает контрольные цифры к 9 (юр. лицо) или 10 (физ. лицо) цифрам"""
+    if len(body) == 9:
+        return body + check_digit(body, WEIGHTS_10)
+    if len(body) == 10:
+        body += check_digit(body, WEIGHTS_11)
+        return body + check_digit(body, WEIGHTS_12)
+    raise InnError("основа ИНН должна состоять из 9 или 10 цифр")
+
+
+def is_valid_checksum(inn: str) -> bool:
+    if len(inn) == 10:
+        return inn[9] == check_digit(inn, WEIGHTS_10)
+    if len(inn) == 12:
+        return inn[10] == check_digit(inn, WEIGHTS_11) and inn[11] == check_digit(inn, WEIGHTS_12)
+    return False
+
+
+def normalize_inn(raw: str) -> str:
+    """Приводит ИНН к виду «только цифры» и проверяет длину
+
+    Текст вокруг номера отбрасывается («ИНН 7707083893», «ИНН/КПП 7707083893/770701001»):
+    берется первая группа цифр длиной 10 или 12. Годится для поиска; при записи
+    нужен validate_inn.
+    """
+    for match in _DIGIT_RUN.finditer(str(raw)):
+        digits = re.sub(r"\D", "", match.group())
+        if len(digits) in (10, 12):
+            return digits
+    raise InnError("ИНН должен содержать 10 или 12 цифр")
+
+
+def validate_inn(raw: str) -> str:
+    """Нормализация плюс проверка контрольных цифр"""
+    inn = normalize_inn(raw)
+    if not is_valid_checksum(inn):
+        raise InnError(f"неверные контрольные цифры ИНН {inn}")
+    return inn
@@ -0,0 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI
+from .cache import user_cache
+from .database import async_engine
+from .metrics import MetricsMiddleware
+from .profiling import SqlProfilerMiddleware
+from .routes import router
+from .serialization import OrjsonResponse
+from .sms import sms_queue
+from .otp_compaction import OTP_COMPACTION_INTERVAL, run_periodically as run_otp_compaction
+from .rollups import ROLLUP_REFRESH_INTERVAL, run_periodically as run_rollup_refresh
+from .idempotency import IDEMPOTENCY_PURGE_INTERVAL, run_periodically as run_idempotency_purge
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    user_cache.bind_loop(asyncio.get_running_loop())
+    await sms_queue.start()
+    background = []
+    if OTP_COMPACTION_INTERVAL > 0:
+        background.append(asyncio.create_task(run_otp_compaction(async_engine, OTP_COMPACTION_INTERVAL)))
+    if ROLLUP_REFRESH_INTERVAL > 0:
+        background.append(asyncio.create_task(run_rollup_refresh(async_engine, ROLLUP_REFRESH_INTERVAL)))
+    if IDEMPOTENCY_PURGE_INTERVAL > 0:
+        background.append(asyncio.create_task(run_idempotency_purge(async_engine, IDEMPOTENCY_PURGE_INTERVAL)))
+    yield
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await sms_queue.stop()
+    user_cache.bind_loop(None)
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=OrjsonResponse)
+app.add_middleware(SqlProfilerMiddleware)
+# Добавленная последней прослойка внешняя: задержка включает профилирование SQL
+app.add_middleware(MetricsMiddleware)
+app.include_router(router)
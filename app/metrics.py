@@ -0,0 +1,251 @@
+import threading
+import time
+from bisect import bisect_left
+
+from .cache import user_cache
+from .idempotency import response_cache
+from .pool_stats import async_pool_stats, sync_pool_stats
+from .profiling import sql_stats
+from .search import catalogue_cache
+
+# Границы корзин задержки маршрутов, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _PerThread:
+    """Значения метрики по потокам: запись идет в словарь своего потока без блокировок
+
+    Блокировка берется только при первом обращении потока и при сборе метрик,
+    чтобы прочитать список словарей. Чтение чужого словаря под GIL безопасно:
+    list(dict.items()) не выполняет Python-кода.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def items(self) -> list[tuple]:
+        with self._lock:
+            shards = list(self._shards)
+        return [item for shard in shards for item in list(shard.items())]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = _PerThread()
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        shard = self._values.shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        totals: dict[tuple, float] = {}
+        for labels, value in self._values.items():
+            totals[labels] = totals.get(labels, 0) + value
+        return [(self.name, self._pairs(labels), value) for labels, value in sorted(totals.items())]
+
+    def _pairs(self, labels: tuple) -> tuple:
+        return tuple(zip(self.labelnames, labels))
+
+
+class Gauge(Counter):
+    """Счетчик, который может уменьшаться (запросы в работе)"""
+
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...], labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        shard = self._values.shard()
+        state = shard.get(labels)
+        if state is None:
+            # Счетчики корзин (последняя - +Inf) и сумма в конце
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def samples(self) -> list[tuple[str, tuple, float]]:
+        totals: dict[tuple, list] = {}
+        for labels, state in self._values.items():
+            total = totals.setdefault(labels, [0] * len(state))
+            for index, value in enumerate(list(state)):
+                total[index] += value
+        result = []
+        for labels, state in sorted(totals.items()):
+            pairs = self._pairs(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                result.append((f"{self.name}_bucket", pairs + (("le", le),), cumulative))
+            result.append((f"{self.name}_sum", pairs, state[-1]))
+            result.append((f"{self.name}_count", pairs, cumulative))
+        return result
+
+
+_metrics: list[Counter] = []
+_collectors = []
+
+
+def register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collector):
+    """collector() -> [(имя, тип, описание, [(имя отсчета, метки, значение)])], вызывается при сборе"""
+    _collectors.append(collector)
+    return collector
+
+
+http_requests = register(Counter(
+    "http_requests_total", "HTTP-запросы по маршрутам и кодам ответа", ("method", "route", "status"),
+))
+http_latency = register(Histogram(
+    "http_request_duration_seconds", "Время обработки запроса", LATENCY_BUCKETS, ("method", "route"),
+))
+http_in_flight = register(Gauge("http_requests_in_flight", "Запросы в работе"))
+
+otp_issued = register(Counter("otp_issued_total", "Выданные одноразовые коды"))
+otp_verified = register(Counter("otp_verified_total", "Успешные входы по коду"))
+otp_rejected = register(Counter("otp_rejected_total", "Отклоненные запросы кода и входы", ("reason",)))
+
+idempotent_replays = register(Counter("idempotent_replays_total", "Повторы POST /orders, получившие сохраненный ответ"))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_samples(lines: list[str], samples) -> None:
+    for name, labels, value in samples:
+        if labels:
+            rendered = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+            lines.append(f"{name}{{{rendered}}} {value}")
+        else:
+            lines.append(f"{name} {value}")
+
+
+def render() -> str:
+    """Текстовый формат Prometheus 0.0.4"""
+    lines: list[str] = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        _format_samples(lines, metric.samples())
+    for collector in _collectors:
+        for name, kind, help, samples in collector():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            _format_samples(lines, samples)
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI-прослойка: задержка, коды ответа и число запросов в работе по маршрутам
+
+    Маршрут берется шаблоном пути (/users/{user_id}), чтобы не плодить метки.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_latency.observe(elapsed, (scope["method"], route))
+            http_requests.inc((scope["method"], route, status))
+
+
+@register_collector
+def _pool_metrics():
+    snapshots = [stats.snapshot() for stats in (sync_pool_stats, async_pool_stats)]
+
+    def by_pool(key):
+        return [(f"db_pool_{key}", (("pool", s["name"]),), s[key]) for s in snapshots]
+
+    wait = []
+    for s in snapshots:
+        labels = (("pool", s["name"]),)
+        for bound, count in s["wait_seconds_buckets"]:
+            wait.append(("db_pool_wait_seconds_bucket", labels + (("le", str(bound)),), count))
+        wait.append(("db_pool_wait_seconds_sum", labels, s["wait_seconds_sum"]))
+        wait.append(("db_pool_wait_seconds_count", labels, s["checkouts"]))
+    return [
+        ("db_pool_size", "gauge", "Размер пула соединений", by_pool("size")),
+        ("db_pool_checked_out", "gauge", "Соединения, выданные из пула", by_pool("checked_out")),
+        ("db_pool_overflow", "gauge", "Соединения сверх размера пула", by_pool("overflow")),
+        ("db_pool_checkout_timeouts_total", "counter", "Таймауты ожидания соединения",
+         [("db_pool_checkout_timeouts_total", labels, value) for _, labels, value in by_pool("checkout_timeouts")]),
+        ("db_pool_wait_seconds", "histogram", "Ожидание соединения из пула", wait),
+    ]
+
+
+@register_collector
+def _cache_metrics():
+    caches = {
+        "users": user_cache.stats(),
+        "catalogues": catalogue_cache.stats(),
+        "idempotency": response_cache.stats(),
+    }
+    result = []
+    for key, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        name = f"cache_{key}" + ("_total" if kind == "counter" else "")
+        samples = [(name, (("cache", cache),), stats[key]) for cache, stats in caches.items()]
+        result.append((name, kind, f"Кэши процесса: {key}", samples))
+    return result
+
+
+@register_collector
+def _sql_metrics():
+    routes = sql_stats.snapshot()
+    return [
+        ("db_queries_total", "counter", "SQL-запросы по маршрутам",
+         [("db_queries_total", (("route", route),), stats["queries"]) for route, stats in routes.items()]),
+        ("db_time_seconds_total", "counter", "Время в базе по маршрутам",
+         [("db_time_seconds_total", (("route", route),), stats["db_seconds"]) for route, stats in routes.items()]),
+        ("db_n_plus_one_total", "counter", "Запросы с вероятным N+1",
+         [("db_n_plus_one_total", (("route", route),), stats["n_plus_one"]) for route, stats in routes.items()]),
+    ]
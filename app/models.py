@@ -1,11 +1,13 @@
 from decimal import Decimal
 from datetime import datetime, timezone
-from uuid import uuid4
 from enum import Enum as PyEnum
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Numeric, Index, UniqueConstraint, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, Date, DateTime, Boolean, Numeric, LargeBinary, Index, UniqueConstraint, CheckConstraint, Enum, text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship 
+from sqlalchemy.orm import relationship, validates
 from .database import Base
+from .ids import uuid7
+from .inn import validate_inn
+from .phone import E164_PATTERN, normalize_phone
 
 class UserRole(PyEnum):
     USER = "user"
@@ -15,26 +17,43 @@ class CustomerType(PyEnum):
     LEGAL_ENTITY = "legal_entity"
     INDIVIDUAL = "individual"
 
+def enum_values(enum_cls):
+    # В базе хранятся значения ('user', 'legal_entity'), как их пишут сиды
+    return [member.value for member in enum_cls]
+
 class User(Base): 
     __tablename__ = "users"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True) 
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7) 
     surname = Column(String(100), nullable=False) 
     name = Column(String(100), nullable=False)
     patronymic = Column(String(100), nullable=True)
     phone_number = Column(String(20), nullable=False, unique=True, index=True)
     inn = Column(String(12), nullable=False, unique=True, index=True)
-    role = Column(Enum(UserRole, native_enum=False, length=50), nullable=False, default=UserRole.USER)
+    role = Column(Enum(UserRole, native_enum=False, length=50, values_callable=enum_values), nullable=False, default=UserRole.USER)
     
     products = relationship("Product", back_populates="user", cascade="all, delete-orphan")
     customers = relationship("Customer", back_populates="user", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="user")
+
+    __table_args__ = (
+        CheckConstraint("inn ~ '^([0-9]{10}|[0-9]{12})$'", name='ck_users_inn_digits'),
+        CheckConstraint(f"phone_number ~ '{E164_PATTERN}'", name='ck_users_phone_e164'),
+    )
+
+    @validates("inn")
+    def check_inn(self, key, value):
+        return validate_inn(value)
+
+    @validates("phone_number")
+    def check_phone_number(self, key, value):
+        return normalize_phone(value)
     
     def __repr__(self):
         return f"<User(id={self.id}, name={self.name}, phone={self.phone_number}, role={self.role.value})>"
 
 class Product(Base): 
     __tablename__ = "products"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True) 
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7) 
     name = Column(String(200), nullable=False)
     price = Column(Numeric(10, 2), nullable=False)
     is_countable = Column(Boolean, nullable=False, default=True)  # True - исчисляемый, False - неисчисляемый
@@ -42,50 +61,75 @@ class Product(Base):
     
     user = relationship("User", back_populates="products")
     orderproducts = relationship("OrderProduct", back_populates="product")
+
+    __table_args__ = (
+        # Поиск по подстроке в пределах пользователя (pg_trgm + btree_gin)
+        Index('ix_products_user_name_trgm', 'user_id', 'name',
+              postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
     
     def __repr__(self):
         return f"<Product(id={self.id}, name={self.name}, price={self.price})>"
 
 class Customer(Base): 
     __tablename__ = "customers"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True) 
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7) 
     name = Column(String(200), nullable=False)
-    inn = Column(String(12), nullable=False, index=True)
-    customer_type = Column(Enum(CustomerType, native_enum=False, length=50), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    inn = Column(String(12), nullable=False)
+    customer_type = Column(Enum(CustomerType, native_enum=False, length=50, values_callable=enum_values), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
    
     user = relationship("User", back_populates="customers")
     orders = relationship("Order", back_populates="customer")
     
     __table_args__ = (
-        UniqueConstraint('inn', 'user_id', name='uq_customer_inn_user'),
+        # Индекс уникальности заодно покрывающий: поиск по ИНН читается
+        # только из него (index-only scan)
+        UniqueConstraint('user_id', 'inn', name='uq_customer_inn_user',
+                         postgresql_include=['id', 'name', 'customer_type']),
+        CheckConstraint("inn ~ '^([0-9]{10}|[0-9]{12})$'", name='ck_customers_inn_digits'),
+        Index('ix_customers_user_name_trgm', 'user_id', 'name',
+              postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
     )
+
+    @validates("inn")
+    def check_inn(self, key, value):
+        return validate_inn(value)
     
     def __repr__(self):
         return f"<Customer(id={self.id}, name={self.name}, inn={self.inn}, type={self.customer_type.value})>"
 
 class Order(Base): 
     __tablename__ = "orders"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True) 
-    number = Column(Integer, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7) 
+    number = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
-    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=False, index=True)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="RESTRICT"), nullable=False, index=True)
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="RESTRICT"), nullable=False)
   
     user = relationship("User", back_populates="orders")
     customer = relationship("Customer", back_populates="orders")
-    orderproducts = relationship("OrderProduct", back_populates="order", cascade="all, delete-orphan")
+    orderproducts = relationship(
+        "OrderProduct", back_populates="order", cascade="all, delete-orphan", order_by="OrderProduct.id"
+    )
     
     __table_args__ = (
         UniqueConstraint('number', 'user_id', name='uq_order_number_user'),
+        # Постраничный список заказов пользователя по (created_at, id)
+        Index('ix_orders_user_created', 'user_id', 'created_at', 'id'),
+        # Заказы заказчика в отчетах; покрывает и внешний ключ customer_id
+        Index('ix_orders_customer_created', 'customer_id', 'created_at'),
     )
     
     def __repr__(self):
         return f"<Order(id={self.id}, number={self.number}, created_at={self.created_at})>"
 
+# Верхняя граница order_products.quantity (INTEGER) для проверок ввода
+MAX_QUANTITY = 2**31 - 1
+
 class OrderProduct(Base): 
     __tablename__ = "order_products"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     quantity = Column(Integer, nullable=False)
     price = Column(Numeric(10, 2), nullable=False)
     order_id = Column(UUID(as_uuid=True), ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -98,11 +142,68 @@ class OrderProduct(Base):
 
 class OneTimePassword(Base): 
     __tablename__ = "one_time_passwords"
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4, index=True) 
-    phone_number = Column(String(20), nullable=False, index=True)
-    code = Column(Integer, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7) 
+    phone_number = Column(String(20), nullable=False)
+    # hash_code(phone_number, code) из app/otp.py; NULL у старых использованных кодов
+    code_hash = Column(BigInteger, nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     is_used = Column(Boolean, nullable=False, default=False)
+    # Неверные попытки ввода, после OTP_MAX_ATTEMPTS код гаснет (app/otp.py)
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    
+    __table_args__ = (
+        # Поиск свежего неиспользованного кода при логине
+        Index('ix_one_time_passwords_phone_created_unused', 'phone_number', 'created_at',
+              postgresql_where=text('NOT is_used')),
+        # Очистка старых кодов пачками (app/otp_compaction.py)
+        Index('ix_one_time_passwords_created_at', 'created_at'),
+    )
+
+    @validates("phone_number")
+    def check_phone_number(self, key, value):
+        return normalize_phone(value)
     
     def __repr__(self):
         return f"<OneTimePassword(id={self.id}, phone={self.phone_number}, is_used={self.is_used})>"
+
+class OrderNumberCounter(Base):
+    """Последний выданный номер заказа пользователя (см. app/numbering.py)"""
+    __tablename__ = "order_number_counters"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_number = Column(Integer, nullable=False)
+
+class RevenueRollup(Base):
+    """Выручка за месяц в разрезе заказчика и товара, пересчитывается по меткам RevenueRollupDirty"""
+    __tablename__ = "revenue_rollups"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    orders_count = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+    revenue = Column(Numeric(14, 2), nullable=False)
+    
+    def __repr__(self):
+        return f"<RevenueRollup(user_id={self.user_id}, month={self.month}, revenue={self.revenue})>"
+
+class RevenueRollupDirty(Base):
+    """Месяцы пользователя, затронутые изменениями orders/order_products (заполняется триггерами)"""
+    __tablename__ = "revenue_rollup_dirty"
+    user_id = Column(UUID(as_uuid=True), primary_key=True)
+    month = Column(Date, primary_key=True)
+
+class IdempotencyKey(Base):
+    """Ответ на POST-запрос с заголовком Idempotency-Key, повторяется для повторов (см. app/idempotency.py)"""
+    __tablename__ = "idempotency_keys"
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(LargeBinary, nullable=False)
+    # NULL, пока запрос выполняется; ответ пишется в той же транзакции
+    status_code = Column(Integer, nullable=True)
+    response = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Очистка устаревших ключей
+        Index('ix_idempotency_keys_created_at', 'created_at'),
+    )
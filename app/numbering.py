@@ -0,0 +1,62 @@
+import asyncio
+import os
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .database import async_engine
+
+ORDER_NUMBER_BLOCK = int(os.getenv("ORDER_NUMBER_BLOCK", "10"))
+
+# Счетчик сдвигается на count одним оператором; строка блокируется только на время
+# короткой отдельной транзакции, таблица orders при этом не читается и не блокируется
+ALLOCATE_SQL = text("""
+    INSERT INTO order_number_counters (user_id, last_number)
+    VALUES (:user_id, :count)
+    ON CONFLICT (user_id) DO UPDATE
+    SET last_number = order_number_counters.last_number + EXCLUDED.last_number
+    RETURNING last_number
+""")
+
+
+async def allocate_order_numbers(engine: AsyncEngine, user_id: UUID, count: int) -> range:
+    """Выдает count подряд идущих номеров заказов пользователя
+
+    Номера фиксируются сразу (своя транзакция), поэтому если заказ потом не
+    сохранится, в нумерации останется пропуск, но повторов не будет никогда.
+    """
+    async with engine.begin() as connection:
+        last = (await connection.execute(ALLOCATE_SQL, {"user_id": user_id, "count": count})).scalar()
+    return range(last - count + 1, last + 1)
+
+
+class OrderNumberAllocator:
+    """Кэш блоков номеров в процессе: один запрос к счетчику на block_size заказов"""
+
+    def __init__(self, engine: AsyncEngine, block_size: int = ORDER_NUMBER_BLOCK, max_users: int = 10_000):
+        self.engine = engine
+        self.block_size = block_size
+        self.max_users = max_users
+        self._blocks: dict[UUID, list[int]] = {}
+        self._locks: dict[UUID, asyncio.Lock] = {}
+
+    async def next_number(self, user_id: UUID) -> int:
+        block = self._blocks.get(user_id)
+        if block:
+            return block.pop()
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            block = self._blocks.get(user_id)
+            if not block:
+                numbers = await allocate_order_numbers(self.engine, user_id, self.block_size)
+                if len(self._blocks) >= self.max_users:
+                    # Остаток блока у давно не заказывавших пользователей просто теряется
+                    self._blocks.clear()
+                    self._locks = {user_id: lock}
+                block = self._blocks[user_id] = list(reversed(numbers))
+            return block.pop()
+
+
+order_numbers = OrderNumberAllocator(async_engine)
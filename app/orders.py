@@ -0,0 +1,304 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from .idempotency import (
+    StoredResponse,
+    check_replay,
+    expired_before,
+    load_stored,
+    request_fingerprint,
+    response_cache,
+    save_response,
+)
+from .ids import uuid7
+from .models import Customer, Order, OrderProduct, Product
+from .numbering import OrderNumberAllocator
+from .serialization import dumps
+
+MAX_PAGE_SIZE = 100
+MAX_ORDER_ITEMS = 500
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, order_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{order_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise CursorError("Некорректный курсор")
+
+
+def order_page_statement(user_id: UUID, limit: int, cursor: str | None = None):
+    """Страница заказов пользователя, от новых к старым
+
+    Позиция задается парой (created_at, id) последнего заказа предыдущей страницы,
+    поэтому стоимость не зависит от номера страницы (в отличие от OFFSET).
+    Позиции с товарами подгружаются одним selectinload, поэтому страница - ровно
+    два запроса: заказы с заказчиками и позиции с товарами.
+    """
+    statement = (
+        select(Order)
+        .where(Order.user_id == user_id)
+        .options(
+            joinedload(Order.customer),
+            selectinload(Order.orderproducts).joinedload(OrderProduct.product, innerjoin=True),
+        )
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        created_at, order_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+    return statement
+
+
+def next_cursor(orders: list, limit: int) -> tuple[list, str | None]:
+    """Отрезает лишнюю (limit + 1) запись и строит курсор следующей страницы"""
+    if len(orders) <= limit:
+        return orders, None
+    orders = orders[:limit]
+    return orders, encode_cursor(orders[-1].created_at, orders[-1].id)
+
+
+# Быстрый путь для списка: выбираются только нужные колонки, строки
+# раскладываются в DTO и сразу сериализуются orjson (app/serialization.py).
+# ORM-объекты, identity map и Pydantic не участвуют; JSON совпадает со схемой
+# schemas.OrderPage. Dataclass без slots: orjson читает __dict__ напрямую,
+# а поля со __slots__ достает по одному, страница из 1000 заказов так
+# сериализуется почти вдвое медленнее (scripts/bench_json.py).
+
+@dataclass
+class OrderCustomerRow:
+    id: UUID
+    name: str
+    inn: str
+
+
+@dataclass
+class OrderItemRow:
+    id: UUID
+    product_id: UUID
+    product_name: str
+    quantity: int
+    price: Decimal
+
+
+@dataclass
+class OrderRow:
+    id: UUID
+    number: int
+    created_at: datetime
+    customer: OrderCustomerRow
+    items: list[OrderItemRow]
+
+
+@dataclass
+class OrderPageRows:
+    items: list[OrderRow]
+    next_cursor: str | None
+
+
+def order_rows_statement(user_id: UUID, limit: int, cursor: str | None = None):
+    """Те же заказы, что у order_page_statement, но колонками"""
+    statement = (
+        select(Order.id, Order.number, Order.created_at, Customer.id, Customer.name, Customer.inn)
+        .join(Customer, Customer.id == Order.customer_id)
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        created_at, order_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+    return statement
+
+
+def order_items_statement(order_ids: list[UUID]):
+    return (
+        select(
+            OrderProduct.order_id,
+            OrderProduct.id,
+            OrderProduct.product_id,
+            Product.name,
+            OrderProduct.quantity,
+            OrderProduct.price,
+        )
+        .join(Product, Product.id == OrderProduct.product_id)
+        .where(OrderProduct.order_id.in_(order_ids))
+        .order_by(OrderProduct.order_id, OrderProduct.id)
+    )
+
+
+async def fetch_order_page(db: AsyncSession, user_id: UUID, limit: int, cursor: str | None = None) -> OrderPageRows:
+    """Страница заказов за два запроса: заказы с заказчиками и позиции с товарами"""
+    rows = (await db.execute(order_rows_statement(user_id, limit, cursor))).all()
+    orders, cursor = next_cursor(
+        [
+            OrderRow(order_id, number, created_at, OrderCustomerRow(customer_id, name, inn), [])
+            for order_id, number, created_at, customer_id, name, inn in rows
+        ],
+        limit,
+    )
+    if orders:
+        by_id = {order.id: order.items for order in orders}
+        for order_id, *item in await db.execute(order_items_statement(list(by_id))):
+            by_id[order_id].append(OrderItemRow(*item))
+    return OrderPageRows(orders, cursor)
+
+
+# Заказ и все позиции - один оператор. Ключ идемпотентности занимается первым
+# CTE; если ключ уже занят, заказ не вставляется (одновременный повтор ждет на
+# уникальном индексе, пока первый запрос не завершится). Заказчик и товары
+# вставляются только свои: чужие или несуществующие просто не попадают в
+# RETURNING, это проверяется по числу строк. Цена позиции по умолчанию -
+# текущая цена товара.
+CREATE_ORDER_SQL = text("""
+    WITH claim AS (
+        INSERT INTO idempotency_keys (user_id, key, request_hash, created_at)
+        SELECT :user_id, CAST(:key AS varchar), :request_hash, :created_at
+        WHERE CAST(:key AS varchar) IS NOT NULL
+        ON CONFLICT (user_id, key) DO UPDATE
+        SET request_hash = EXCLUDED.request_hash, created_at = EXCLUDED.created_at,
+            status_code = NULL, response = NULL
+        WHERE idempotency_keys.created_at < :expired_before
+        RETURNING 1
+    ),
+    new_order AS (
+        INSERT INTO orders (id, number, created_at, customer_id, user_id)
+        SELECT :order_id, :number, :created_at, c.id, c.user_id
+        FROM customers c
+        WHERE c.id = :customer_id AND c.user_id = :user_id
+          AND (CAST(:key AS varchar) IS NULL OR EXISTS (SELECT 1 FROM claim))
+        RETURNING id, number, created_at, customer_id
+    ),
+    lines AS (
+        INSERT INTO order_products (id, quantity, price, order_id, product_id)
+        SELECT l.id, l.quantity, coalesce(l.price, p.price), o.id, p.id
+        FROM new_order o
+        CROSS JOIN unnest(CAST(:item_ids AS uuid[]), CAST(:product_ids AS uuid[]),
+                          CAST(:quantities AS integer[]), CAST(:prices AS numeric[]))
+                   AS l(id, product_id, quantity, price)
+        JOIN products p ON p.id = l.product_id AND p.user_id = :user_id
+        RETURNING id, product_id, quantity, price
+    )
+    SELECT EXISTS (SELECT 1 FROM claim) AS claimed,
+           o.id, o.number, o.created_at, c.id AS customer_id, c.name AS customer_name, c.inn AS customer_inn,
+           l.id AS item_id, l.product_id, p.name AS product_name, l.quantity, l.price
+    FROM (SELECT 1) AS one
+    LEFT JOIN new_order o ON true
+    LEFT JOIN customers c ON c.id = o.customer_id
+    LEFT JOIN lines l ON o.id IS NOT NULL
+    LEFT JOIN products p ON p.id = l.product_id
+    ORDER BY l.id
+""")
+
+
+class OrderCreateError(ValueError):
+    pass
+
+
+class _KeyTaken(Exception):
+    """Ключ занят завершенным запросом: транзакция откатывается, ответ берется сохраненный"""
+
+
+async def insert_order(
+    connection,
+    user_id: UUID,
+    number: int,
+    customer_id: UUID,
+    items: list[tuple[UUID, int, Decimal | None]],
+    key: str | None = None,
+    request_hash: bytes | None = None,
+) -> OrderRow | None:
+    """Вставляет заказ с позициями за один запрос; None - ключ уже занят"""
+    # uuid7 возрастают, поэтому ORDER BY l.id возвращает позиции в порядке запроса
+    item_ids = [uuid7() for _ in items]
+    rows = (await connection.execute(CREATE_ORDER_SQL, {
+        "user_id": user_id,
+        "key": key,
+        "request_hash": request_hash,
+        "created_at": datetime.now(timezone.utc),
+        "expired_before": expired_before(),
+        "order_id": uuid7(),
+        "number": number,
+        "customer_id": customer_id,
+        "item_ids": item_ids,
+        "product_ids": [product_id for product_id, _, _ in items],
+        "quantities": [quantity for _, quantity, _ in items],
+        "prices": [price for _, _, price in items],
+    })).all()
+    first = rows[0]
+    if key is not None and not first.claimed:
+        return None
+    if first.id is None:
+        raise OrderCreateError("Заказчик не найден")
+    if len(rows) != len(items) or rows[-1].item_id is None:
+        raise OrderCreateError("Не найдены товары из заказа")
+    return OrderRow(
+        first.id,
+        first.number,
+        first.created_at,
+        OrderCustomerRow(first.customer_id, first.customer_name, first.customer_inn),
+        [OrderItemRow(row.item_id, row.product_id, row.product_name, row.quantity, row.price) for row in rows],
+    )
+
+
+async def create_order(
+    engine: AsyncEngine,
+    numbers: OrderNumberAllocator,
+    user_id: UUID,
+    customer_id: UUID,
+    items: list[tuple[UUID, int, Decimal | None]],
+    key: str | None = None,
+) -> tuple[StoredResponse, bool]:
+    """Создает заказ или повторяет сохраненный ответ; второе значение - «это повтор»
+
+    С ключом Idempotency-Key повтор того же запроса (после обрыва связи)
+    возвращает исходный ответ и не трогает orders: сначала ищется в кэше
+    процесса, затем в idempotency_keys. Ответ сохраняется в той же
+    транзакции, что и заказ.
+    """
+    request_hash = None
+    if key is not None:
+        request_hash = request_fingerprint([customer_id, items])
+        stored = response_cache.get(user_id, key)
+        if stored is not None:
+            return check_replay(stored, request_hash), True
+
+    number = await numbers.next_number(user_id)
+    try:
+        async with engine.begin() as connection:
+            order = await insert_order(connection, user_id, number, customer_id, items, key, request_hash)
+            if order is None:
+                raise _KeyTaken
+            response = StoredResponse(request_hash, 201, dumps(order))
+            if key is not None:
+                await save_response(connection, user_id, key, response)
+    except _KeyTaken:
+        # Номер, выданный под повтор, пропадает: пропуски в нумерации допустимы
+        async with engine.connect() as connection:
+            stored = await load_stored(connection, user_id, key)
+        if stored is None:
+            raise OrderCreateError("Запрос с этим ключом еще выполняется, повторите позже")
+        response_cache.set(user_id, key, stored)
+        return check_replay(stored, request_hash), True
+
+    if key is not None:
+        response_cache.set(user_id, key, response)
+    return response, False
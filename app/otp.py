@@ -0,0 +1,118 @@
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import exists, select, update
+
+from .models import OneTimePassword, User
+from .ratelimit import TokenBucketLimiter
+from .tokens import SECRET_KEY
+
+# Время жизни одноразового кода
+OTP_TTL = timedelta(seconds=int(os.getenv("OTP_TTL_SECONDS", "300")))
+
+# Не больше 3 кодов подряд на номер, дальше один раз в минуту
+phone_limiter = TokenBucketLimiter(
+    capacity=float(os.getenv("OTP_PHONE_BURST", "3")),
+    refill_per_second=1 / float(os.getenv("OTP_PHONE_INTERVAL_SECONDS", "60")),
+)
+
+# С одного IP не больше 10 запросов подряд, дальше один раз в 6 секунд
+ip_limiter = TokenBucketLimiter(
+    capacity=float(os.getenv("OTP_IP_BURST", "10")),
+    refill_per_second=1 / float(os.getenv("OTP_IP_INTERVAL_SECONDS", "6")),
+)
+
+
+# Сколько неверных попыток выдерживает код: после последней гаснут все живые коды номера
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+
+# Попытки входа с одного IP и на один номер, до обращения к базе
+login_ip_limiter = TokenBucketLimiter(
+    capacity=float(os.getenv("LOGIN_IP_BURST", "20")),
+    refill_per_second=1 / float(os.getenv("LOGIN_IP_INTERVAL_SECONDS", "3")),
+)
+login_phone_limiter = TokenBucketLimiter(
+    capacity=float(os.getenv("LOGIN_PHONE_BURST", str(OTP_MAX_ATTEMPTS))),
+    refill_per_second=1 / float(os.getenv("LOGIN_PHONE_INTERVAL_SECONDS", "30")),
+)
+
+
+def generate_code() -> int:
+    """Генерирует четырехзначный код, как в сидах OneTimePassword"""
+    return 1000 + secrets.randbelow(9000)
+
+
+# Ключ хэша кодов выводится из AUTH_SECRET_KEY, отдельная настройка не нужна
+OTP_HASH_KEY = hashlib.blake2b(SECRET_KEY, digest_size=32, person=b"otp-code-hash").digest()
+
+
+def hash_code(phone_number: str, code: int) -> int:
+    """Ключевой blake2b от номера и кода, 8 байт как знаковый BIGINT
+
+    В базе нет открытых кодов, а без ключа перебрать 9000 вариантов по дампу
+    нельзя. Номер входит в хэш, поэтому одинаковые коды разных номеров различаются.
+    """
+    digest = hashlib.blake2b(f"{phone_number}:{code}".encode(), key=OTP_HASH_KEY, digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def otp_message(code: int) -> str:
+    return f"Код для входа: {code}"
+
+
+def verify_otp_statement(phone_number: str, code: int, now: datetime | None = None):
+    """Один запрос: сверяет код с последним живым кодом номера, гасит все живые и возвращает пользователя
+
+    Живые коды номера читаются по частичному индексу (phone_number, created_at)
+    WHERE NOT is_used. Принимается только последний выданный код, иначе каждая
+    попытка угадывала бы любой из нескольких кодов сразу. Если хэш совпал, UPDATE
+    помечает использованными все живые коды, так что повтор того же кода и
+    старые коды больше не пройдут. Неверная попытка увеличивает attempts у живых кодов, и после
+    OTP_MAX_ATTEMPTS промахов они гаснут: перебрать 9000 кодов за время жизни
+    кода нельзя, а дальше перебор снова чистое чтение по пустому индексу.
+    Из двух одновременных верных попыток пользователя получит только та, чей
+    UPDATE действительно погасил строки (NOT is_used перепроверяется после
+    ожидания блокировки).
+
+    Сравниваются только ключевые хэши фиксированной длины: открытый код с
+    хранимым значением не сравнивается нигде, и время ответа не зависит от того,
+    насколько близок подобранный код. Номер должен быть уже приведен к E.164
+    (app/phone.py), сравнение точное.
+    """
+    now = now or datetime.now(timezone.utc)
+    live = (
+        select(OneTimePassword.id, OneTimePassword.code_hash, OneTimePassword.created_at)
+        .where(
+            OneTimePassword.phone_number == phone_number,
+            ~OneTimePassword.is_used,
+            OneTimePassword.created_at > now - OTP_TTL,
+        )
+        .cte("live")
+    )
+    newest = select(live.c.code_hash).order_by(live.c.created_at.desc(), live.c.id.desc()).limit(1)
+    matched = newest.scalar_subquery() == hash_code(phone_number, code)
+    consumed = (
+        update(OneTimePassword)
+        .where(OneTimePassword.id.in_(select(live.c.id)), ~OneTimePassword.is_used, matched)
+        .values(is_used=True)
+        .returning(OneTimePassword.id)
+        .cte("consumed")
+    )
+    failed = (
+        update(OneTimePassword)
+        .where(OneTimePassword.id.in_(select(live.c.id)), ~OneTimePassword.is_used, ~matched)
+        .values(
+            attempts=OneTimePassword.attempts + 1,
+            is_used=OneTimePassword.attempts + 1 >= OTP_MAX_ATTEMPTS,
+        )
+        .returning(OneTimePassword.id)
+        .cte("failed")
+    )
+    # failed не участвует в выборке, но выполняется: add_cte выводит его в WITH
+    return (
+        select(User.id, User.role)
+        .where(User.phone_number == phone_number, exists(select(consumed.c.id)))
+        .add_cte(failed)
+    )
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .otp import OTP_TTL
+
+logger = logging.getLogger(__name__)
+
+# Сколько хранить использованные и просроченные коды (для разбора инцидентов)
+OTP_RETENTION = timedelta(days=int(os.getenv("OTP_RETENTION_DAYS", "7")))
+OTP_COMPACTION_BATCH = int(os.getenv("OTP_COMPACTION_BATCH", "5000"))
+OTP_COMPACTION_INTERVAL = int(os.getenv("OTP_COMPACTION_INTERVAL_SECONDS", "0"))
+OTP_PARTITIONS_AHEAD = 3
+# Строки вне помесячных секций (создается миграцией 16ca87662db8)
+DEFAULT_PARTITION = "one_time_passwords_default"
+
+# Одна пачка: строки блокируются по одной, занятые другими транзакциями пропускаются
+DELETE_BATCH_SQL = text("""
+    WITH doomed AS (
+        SELECT id FROM one_time_passwords
+        WHERE created_at < :used_before AND (is_used OR created_at < :expired_before)
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    DELETE FROM one_time_passwords AS otp
+    USING doomed
+    WHERE otp.id = doomed.id
+""")
+
+IS_PARTITIONED_SQL = text("""
+    SELECT EXISTS (
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'one_time_passwords' AND pg_table_is_visible(c.oid)
+    )
+""")
+
+# Помесячные секции с их верхней границей
+PARTITIONS_SQL = text("""
+    SELECT child.relname,
+           pg_get_expr(child.relpartbound, child.oid) AS bound
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = 'one_time_passwords'
+""")
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    month = moment.month - 1 + months
+    return moment.replace(year=moment.year + month // 12, month=month % 12 + 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"one_time_passwords_p{start:%Y%m}"
+
+
+def create_partition_sql(start: datetime, move_from_default: bool) -> list[str]:
+    """Секция за месяц start; строки этого месяца из секции DEFAULT переносятся в нее
+
+    CREATE TABLE ... PARTITION OF падает, если в DEFAULT уже лежат строки из
+    этого диапазона (например, очистка не запускалась дольше
+    OTP_PARTITIONS_AHEAD месяцев). Поэтому секция создается отдельной таблицей,
+    строки переносятся в нее и только потом она подключается ATTACH PARTITION.
+    """
+    name = partition_name(start)
+    end = add_months(start, 1)
+    statements = [f"CREATE TABLE {name} (LIKE one_time_passwords INCLUDING DEFAULTS)"]
+    if move_from_default:
+        statements.append(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE created_at >= '{start.isoformat()}' AND created_at < '{end.isoformat()}' RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        )
+    statements.append(
+        f"ALTER TABLE one_time_passwords ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return statements
+
+
+async def delete_expired_batches(engine: AsyncEngine, now: datetime | None = None, pause: float = 0.05) -> int:
+    """Удаляет использованные и просроченные коды пачками по OTP_COMPACTION_BATCH строк
+
+    Каждая пачка - отдельная короткая транзакция, так что блокировки держатся
+    миллисекунды, а между пачками автовакуум и запись успевают работать.
+    """
+    now = now or datetime.now(timezone.utc)
+    params = {
+        "used_before": now - OTP_RETENTION,
+        "expired_before": now - OTP_RETENTION - OTP_TTL,
+        "batch_size": OTP_COMPACTION_BATCH,
+    }
+    total = 0
+    while True:
+        async with engine.begin() as connection:
+            deleted = (await connection.execute(DELETE_BATCH_SQL, params)).rowcount
+        total += deleted
+        if deleted < OTP_COMPACTION_BATCH:
+            return total
+        await asyncio.sleep(pause)
+
+
+async def rotate_partitions(engine: AsyncEngine, now: datetime | None = None) -> list[str]:
+    """Для секционированной таблицы: создает секции вперед и удаляет целиком устаревшие"""
+    now = now or datetime.now(timezone.utc)
+    dropped = []
+    async with engine.begin() as connection:
+        if not (await connection.execute(IS_PARTITIONED_SQL)).scalar():
+            return dropped
+
+        partitions = (await connection.execute(PARTITIONS_SQL)).all()
+        existing = {name for name, _ in partitions}
+        current = month_start(now)
+        for months in range(OTP_PARTITIONS_AHEAD + 1):
+            start = add_months(current, months)
+            if partition_name(start) in existing:
+                continue
+            for statement in create_partition_sql(start, DEFAULT_PARTITION in existing):
+                await connection.execute(text(statement))
+
+        # Секция удаляется, когда ее верхняя граница старше срока хранения
+        cutoff = now - OTP_RETENTION
+        for name, bound in partitions:
+            if bound == "DEFAULT":
+                continue
+            upper = datetime.fromisoformat(bound.split("TO ('", 1)[1].split("')", 1)[0])
+            if upper.tzinfo is None:
+                upper = upper.replace(tzinfo=timezone.utc)
+            if upper <= cutoff:
+                await connection.execute(text(f'DROP TABLE "{name}"'))
+                dropped.append(name)
+    return dropped
+
+
+async def compact_otp(engine: AsyncEngine) -> None:
+    dropped = await rotate_partitions(engine)
+    deleted = await delete_expired_batches(engine)
+    logger.info("Очистка OTP: удалено строк %s, секций %s", deleted, len(dropped))
+
+
+async def run_periodically(engine: AsyncEngine, interval: float) -> None:
+    """Фоновая задача приложения: очистка раз в interval секунд"""
+    while True:
+        try:
+            await compact_otp(engine)
+        except Exception:
+            logger.exception("Ошибка очистки one_time_passwords")
+        await asyncio.sleep(interval)
@@ -0,0 +1,38 @@
+import re
+
+# Разрешены только цифры и обычные разделители: «8 (999) 123-45-67», «+7 999 123 45 67»
+_ALLOWED = re.compile(r"[\d\s()+\-.]+")
+E164_PATTERN = r"^\+[1-9][0-9]{7,14}$"
+
+
+class PhoneError(ValueError):
+    pass
+
+
+def normalize_phone(raw: str) -> str:
+    """Приводит номер к E.164 (+79991234567) до любого запроса к базе
+
+    Российские варианты без плюса (8..., 7..., 10 цифр без кода страны) получают +7,
+    международный префикс 00 заменяется на +.
+    """
+    raw = str(raw).strip()
+    if not _ALLOWED.fullmatch(raw):
+        raise PhoneError("номер телефона может содержать только цифры, пробелы, скобки и дефисы")
+    digits = re.sub(r"\D", "", raw)
+    if raw.startswith("+"):
+        number = digits
+    elif digits.startswith("00"):
+        number = digits[2:]
+    elif len(digits) == 11 and digits[0] in "78":
+        number = "7" + digits[1:]
+    elif len(digits) == 10:
+        number = "7" + digits
+    else:
+        raise PhoneError("номер телефона должен содержать 10 или 11 цифр или начинаться с +")
+
+    if number.startswith("7") and len(number) != 11:
+        raise PhoneError("российский номер должен содержать 11 цифр")
+    phone = "+" + number
+    if not re.fullmatch(E164_PATTERN, phone):
+        raise PhoneError("номер телефона не соответствует E.164")
+    return phone
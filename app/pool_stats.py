@@ -0,0 +1,91 @@
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Границы корзин гистограммы ожидания соединения, секунды
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStats:
+    """Счетчики пула соединений: ожидание выдачи, таймауты и текущая загрузка"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def observe_wait(self, seconds: float) -> None:
+        index = bisect_left(WAIT_BUCKETS, seconds)
+        with self._lock:
+            self.wait_counts[index] += 1
+            self.wait_sum += seconds
+            self.checkouts += 1
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            counts = list(self.wait_counts)
+            wait_sum = self.wait_sum
+            checkouts = self.checkouts
+            timeouts = self.timeouts
+
+        # Гистограмма в кумулятивном виде, как принято в Prometheus
+        cumulative = []
+        total = 0
+        for bound, count in zip(WAIT_BUCKETS + (float("inf"),), counts):
+            total += count
+            cumulative.append(("+Inf" if bound == float("inf") else bound, total))
+
+        # QueuePool.overflow() = checkedout - pool_size и отрицателен, пока пул не заполнен
+        overflow = max(0, pool.overflow()) if pool is not None else 0
+        return {
+            "name": self.name,
+            "size": pool.size() if pool is not None else 0,
+            "checked_in": pool.checkedin() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "overflow": overflow,
+            "checkouts": checkouts,
+            "checkout_timeouts": timeouts,
+            "wait_seconds_sum": wait_sum,
+            "wait_seconds_buckets": cumulative,
+        }
+
+
+def instrument_pool(pool_cls, stats: PoolStats):
+    """Создает подкласс пула, который замеряет ожидание соединения в stats"""
+
+    class InstrumentedPool(pool_cls):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            stats.pool = self
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                stats.observe_timeout()
+                raise
+            stats.observe_wait(time.perf_counter() - started)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_cls.__name__}"
+    return InstrumentedPool
+
+
+sync_pool_stats = PoolStats("sync")
+async_pool_stats = PoolStats("async")
+
+InstrumentedQueuePool = instrument_pool(QueuePool, sync_pool_stats)
+InstrumentedAsyncQueuePool = instrument_pool(AsyncAdaptedQueuePool, async_pool_stats)
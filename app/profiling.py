@@ -0,0 +1,205 @@
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+
+from .database import Base, async_engine, engine, env_bool, env_int
+
+logger = logging.getLogger(__name__)
+
+SQL_PROFILE = env_bool("SQL_PROFILE", True)
+# Заголовки X-DB-* в ответе - только для отладки: раскрывают SQL
+SQL_PROFILE_HEADERS = env_bool("SQL_PROFILE_HEADERS", False)
+SLOWEST_STATEMENTS = env_int("SQL_PROFILE_SLOWEST", 3)
+# Сколько одинаковых SELECT за запрос считать вероятным N+1
+N_PLUS_ONE_THRESHOLD = env_int("SQL_N_PLUS_ONE_THRESHOLD", 5)
+HEADER_STATEMENT_LENGTH = 200
+
+_FROM_TABLE = re.compile(r"\bFROM\s+\"?(\w+)\"?", re.IGNORECASE)
+
+
+class RequestProfile:
+    """SQL одного HTTP-запроса: число запросов, время в базе и время по формам запросов"""
+
+    __slots__ = ("queries", "db_time", "shapes")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        # Текст запроса с плейсхолдерами -> [число выполнений, суммарное время]
+        self.shapes: dict[str, list] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_time += seconds
+        shape = self.shapes.get(statement)
+        if shape is None:
+            self.shapes[statement] = [1, seconds]
+        else:
+            shape[0] += 1
+            shape[1] += seconds
+
+    def slowest(self, limit: int = SLOWEST_STATEMENTS) -> list[tuple[str, int, float]]:
+        ranked = sorted(self.shapes.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [(statement, count, seconds) for statement, (count, seconds) in ranked]
+
+    def repeated_selects(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        return [
+            (statement, count)
+            for statement, (count, _) in self.shapes.items()
+            if count >= threshold and statement.lstrip().upper().startswith(("SELECT", "WITH"))
+        ]
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar("sql_profile", default=None)
+
+
+@lru_cache(maxsize=1)
+def relationship_targets() -> dict[str, list[tuple[str, tuple[str, ...]]]]:
+    """Таблица -> связи relationship(), которые ее подгружают, и колонки их условия
+
+    Ленивая загрузка Order.customer ищет по customers.id, а User.customers -
+    по customers.user_id, поэтому по условию WHERE связь обычно определяется точно.
+    """
+    targets: dict[str, list] = {}
+    for mapper in Base.registry.mappers:
+        for relation in mapper.relationships:
+            table = relation.mapper.local_table.name
+            columns = tuple(f"{table}.{column.name} =" for column in relation.remote_side)
+            targets.setdefault(table, []).append((f"{mapper.class_.__name__}.{relation.key}", columns))
+    return targets
+
+
+def suspected_relationships(statement: str) -> list[str]:
+    match = _FROM_TABLE.search(statement)
+    if match is None:
+        return []
+    candidates = relationship_targets().get(match.group(1), [])
+    exact = [name for name, columns in candidates if any(column in statement for column in columns)]
+    return exact or [name for name, _ in candidates]
+
+
+class SqlStats:
+    """Агрегаты по маршрутам для продакшена: запросы, время в базе, подозрения на N+1"""
+
+    def __init__(self):
+        self._routes: dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, profile: RequestProfile, n_plus_one: int) -> None:
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = [0, 0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += profile.queries
+            stats[2] += profile.db_time
+            stats[3] += n_plus_one
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    "requests": requests,
+                    "queries": queries,
+                    "db_seconds": db_seconds,
+                    "n_plus_one": n_plus_one,
+                }
+                for route, (requests, queries, db_seconds, n_plus_one) in self._routes.items()
+            }
+
+
+sql_stats = SqlStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def install(*engines) -> None:
+    for target in engines:
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+def _header_value(text: str) -> bytes:
+    # В заголовке не может быть переводов строк, длинный SQL обрезается
+    return " ".join(text.split())[:HEADER_STATEMENT_LENGTH].encode("latin-1", "replace")
+
+
+def profile_headers(profile: RequestProfile, repeated: list[tuple[str, int]]) -> list[tuple[bytes, bytes]]:
+    headers = [
+        (b"x-db-queries", str(profile.queries).encode()),
+        (b"x-db-time-ms", f"{profile.db_time * 1000:.2f}".encode()),
+    ]
+    for statement, count, seconds in profile.slowest():
+        headers.append((b"x-db-slowest", _header_value(f"{seconds * 1000:.2f}ms x{count} {statement}")))
+    for statement, count in repeated:
+        suspects = ", ".join(suspected_relationships(statement)) or "?"
+        headers.append((b"x-db-n-plus-one", _header_value(f"x{count} {suspects}: {statement}")))
+    return headers
+
+
+def route_name(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class SqlProfilerMiddleware:
+    """ASGI-прослойка: собирает SQL запроса через события движков
+
+    В отладке (SQL_PROFILE_HEADERS) итоги уходят в заголовки X-DB-*, иначе
+    копятся в sql_stats по маршрутам (GET /health/sql). Повторяющиеся SELECT
+    одной формы логируются как вероятный N+1 с подсказкой, какая relationship()
+    их порождает. Для потоковых ответов заголовки отражают только запросы до
+    начала ответа.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_PROFILE:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []), *profile_headers(profile, profile.repeated_selects())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers if SQL_PROFILE_HEADERS else send)
+        finally:
+            _current.reset(token)
+            repeated = profile.repeated_selects()
+            route = route_name(scope)
+            for statement, count in repeated:
+                logger.warning(
+                    "Вероятный N+1 в %s %s: %d одинаковых запросов (%s): %s",
+                    scope["method"], route, count,
+                    ", ".join(suspected_relationships(statement)) or "связь не определена",
+                    " ".join(statement.split())[:HEADER_STATEMENT_LENGTH],
+                )
+            sql_stats.observe(route, profile, len(repeated))
+
+
+if SQL_PROFILE:
+    install(engine, async_engine.sync_engine)
@@ -0,0 +1,44 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Ограничитель запросов «ведро токенов» в памяти процесса
+
+    На каждый ключ (телефон, IP) хранится пара (токены, время обновления).
+    Число ключей ограничено max_keys: самые давние вытесняются, как в LRU,
+    поэтому память не растет при переборе номеров.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 100_000):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, tokens: float = 1.0) -> float:
+        """Списывает токены; возвращает 0, если можно, иначе сколько секунд ждать"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [self.capacity, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                elapsed = now - bucket[1]
+                bucket[0] = min(self.capacity, bucket[0] + elapsed * self.refill_per_second)
+                bucket[1] = now
+
+            if bucket[0] >= tokens:
+                bucket[0] -= tokens
+                return 0.0
+            return (tokens - bucket[0]) / self.refill_per_second
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
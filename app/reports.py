@@ -0,0 +1,59 @@
+from datetime import datetime
+from uuid import UUID
+
+from sqlalchemy import func, select
+
+from .models import Customer, Order, OrderProduct
+
+GROUPINGS = ("order", "customer", "user")
+
+
+def order_summary_statement(
+    user_id: UUID,
+    group_by: str = "order",
+    customer_id: UUID | None = None,
+    order_id: UUID | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+):
+    """Суммы заказов считаются в Postgres: sum(quantity * price) с GROUP BY
+
+    Результат - строки-кортежи, ORM-объекты заказов и позиций не создаются.
+    """
+    line_total = OrderProduct.quantity * OrderProduct.price
+    measures = (
+        func.count(func.distinct(Order.id)).label("orders_count"),
+        func.count(OrderProduct.id).label("items_count"),
+        func.coalesce(func.sum(line_total), 0).label("total"),
+    )
+
+    if group_by == "order":
+        keys = (Order.id.label("order_id"), Order.number, Order.created_at, Order.customer_id)
+    elif group_by == "customer":
+        keys = (Customer.id.label("customer_id"), Customer.name.label("customer_name"))
+    elif group_by == "user":
+        keys = (Order.user_id,)
+    else:
+        raise ValueError(f"group_by должен быть одним из {GROUPINGS}")
+
+    statement = (
+        select(*keys, *measures)
+        .select_from(Order)
+        .outerjoin(OrderProduct, OrderProduct.order_id == Order.id)
+        .where(Order.user_id == user_id)
+        .group_by(*keys)
+    )
+    if group_by == "customer":
+        statement = statement.join(Customer, Customer.id == Order.customer_id).order_by(Customer.name)
+    elif group_by == "order":
+        statement = statement.order_by(Order.created_at.desc(), Order.id.desc())
+
+    if customer_id is not None:
+        statement = statement.where(Order.customer_id == customer_id)
+    if order_id is not None:
+        statement = statement.where(Order.id == order_id)
+    if date_from is not None:
+        statement = statement.where(Order.created_at >= date_from)
+    if date_to is not None:
+        statement = statement.where(Order.created_at < date_to)
+    return statement
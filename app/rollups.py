@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+from datetime import date
+from uuid import UUID
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from .models import Customer, Product, RevenueRollup
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_REFRESH_INTERVAL = int(os.getenv("ROLLUP_REFRESH_INTERVAL_SECONDS", "0"))
+ROLLUP_REFRESH_BATCH = int(os.getenv("ROLLUP_REFRESH_BATCH", "500"))
+
+# Забирает пачку меток; SKIP LOCKED позволяет нескольким процессам обновлять параллельно
+# и пропускает метки, которые держат незакоммиченные записи (триггеры берут их ON CONFLICT DO UPDATE)
+TAKE_DIRTY_SQL = text("""
+    DELETE FROM revenue_rollup_dirty
+    WHERE (user_id, month) IN (
+        SELECT user_id, month FROM revenue_rollup_dirty
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING user_id, month
+""")
+
+DELETE_MONTHS_SQL = text("""
+    DELETE FROM revenue_rollups r
+    USING unnest(CAST(:user_ids AS uuid[]), CAST(:months AS date[])) AS d(user_id, month)
+    WHERE r.user_id = d.user_id AND r.month = d.month
+""")
+
+# Пересчет только помеченных месяцев: диапазон по created_at идет по ix_orders_user_created
+RECOMPUTE_MONTHS_SQL = text("""
+    INSERT INTO revenue_rollups (user_id, month, customer_id, product_id, orders_count, quantity, revenue)
+    SELECT o.user_id, d.month, o.customer_id, op.product_id,
+           count(DISTINCT o.id), sum(op.quantity), sum(op.quantity * op.price)
+    FROM unnest(CAST(:user_ids AS uuid[]), CAST(:months AS date[])) AS d(user_id, month)
+    JOIN orders o
+      ON o.user_id = d.user_id
+     AND o.created_at >= d.month::timestamp AT TIME ZONE 'UTC'
+     AND o.created_at < (d.month + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+    JOIN order_products op ON op.order_id = o.id
+    GROUP BY o.user_id, d.month, o.customer_id, op.product_id
+""")
+
+
+async def refresh_rollups(engine: AsyncEngine) -> int:
+    """Пересчитывает месяцы, помеченные триггерами с прошлого обновления; возвращает их число"""
+    total = 0
+    while True:
+        async with engine.begin() as connection:
+            dirty = (await connection.execute(TAKE_DIRTY_SQL, {"batch_size": ROLLUP_REFRESH_BATCH})).all()
+            if not dirty:
+                return total
+            params = {
+                "user_ids": [row.user_id for row in dirty],
+                "months": [row.month for row in dirty],
+            }
+            await connection.execute(DELETE_MONTHS_SQL, params)
+            await connection.execute(RECOMPUTE_MONTHS_SQL, params)
+        total += len(dirty)
+        if len(dirty) < ROLLUP_REFRESH_BATCH:
+            return total
+
+
+async def run_periodically(engine: AsyncEngine, interval: float) -> None:
+    while True:
+        try:
+            months = await refresh_rollups(engine)
+            if months:
+                logger.info("Пересчитано месяцев выручки: %s", months)
+        except Exception:
+            logger.exception("Ошибка пересчета выручки")
+        await asyncio.sleep(interval)
+
+
+ROLLUP_GROUPINGS = ("customer", "product")
+
+
+def revenue_statement(user_id: UUID, group_by: str, month_from: date | None = None, month_to: date | None = None):
+    """Выручка по месяцам из revenue_rollups, без обращения к orders/order_products"""
+    if group_by == "customer":
+        keys = (RevenueRollup.customer_id, Customer.name.label("customer_name"))
+        join_target, join_on = Customer, Customer.id == RevenueRollup.customer_id
+    elif group_by == "product":
+        keys = (RevenueRollup.product_id, Product.name.label("product_name"))
+        join_target, join_on = Product, Product.id == RevenueRollup.product_id
+    else:
+        raise ValueError(f"group_by должен быть одним из {ROLLUP_GROUPINGS}")
+
+    measures = [
+        func.sum(RevenueRollup.quantity).label("quantity"),
+        func.sum(RevenueRollup.revenue).label("revenue"),
+    ]
+    if group_by == "product":
+        # Заказ относится к одному заказчику, поэтому по товару число заказов складывается
+        # точно; по заказчику сумма посчитала бы заказ с несколькими товарами дважды
+        measures.insert(0, func.sum(RevenueRollup.orders_count).label("orders_count"))
+
+    statement = (
+        select(RevenueRollup.month, *keys, *measures)
+        .join(join_target, join_on)
+        .where(RevenueRollup.user_id == user_id)
+        .group_by(RevenueRollup.month, *keys)
+        .order_by(RevenueRollup.month, *keys)
+    )
+    if month_from is not None:
+        statement = statement.where(RevenueRollup.month >= month_from.replace(day=1))
+    if month_to is not None:
+        statement = statement.where(RevenueRollup.month <= month_to.replace(day=1))
+    return statement
@@ -1,13 +1,411 @@
-from fastapi import APIRouter, Depends 
-from sqlalchemy.orm import Session 
-from . import models, schemas 
-from .database import SessionLocal
-
-router = APIRouter()
-
-def get_db(): 
-    db = SessionLocal() 
-    try: 
-        yield db 
-    finally: 
-        db.close()
+import math
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Query 
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session 
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, schemas 
+from .database import SessionLocal, AsyncSessionLocal, async_engine
+from .pool_stats import sync_pool_stats, async_pool_stats
+from .profiling import sql_stats
+from .metrics import idempotent_replays, otp_issued, otp_rejected, otp_verified, render as render_metrics
+from .otp import phone_limiter, ip_limiter, login_phone_limiter, login_ip_limiter, generate_code, hash_code, otp_message, verify_otp_statement
+from .sms import sms_queue
+from .cache import user_cache
+from .orders import MAX_PAGE_SIZE, CursorError, OrderCreateError, create_order, fetch_order_page
+from .numbering import order_numbers
+from .idempotency import MAX_KEY_LENGTH, IdempotencyError, response_cache
+from .reports import GROUPINGS, order_summary_statement
+from .rollups import ROLLUP_GROUPINGS, revenue_statement
+from .search import MAX_SEARCH_LIMIT, catalogue_cache, search_catalogue
+from .customers import MAX_LOOKUP_INNS, lookup_customers
+from .inn import InnError, normalize_inn
+from .phone import PhoneError, normalize_phone
+from .export import EXPORT_FORMATS, export_statement, year_range, iter_batches, csv_chunks, xlsx_chunks
+from .importer import IMPORT_FORMATS, IMPORT_MAX_BYTES, OrderImportError, import_file
+from .serialization import OrjsonResponse, OrjsonRoute
+from .tokens import TokenClaims, TokenError, decode_token, issue_token_pair, revocations
+
+router = APIRouter(route_class=OrjsonRoute)
+
+def get_db(): 
+    db = SessionLocal() 
+    try: 
+        yield db 
+    finally: 
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+@router.get("/health/pool")
+def read_pool_stats():
+    return {"pools": [sync_pool_stats.snapshot(), async_pool_stats.snapshot()]}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/health/sql")
+def read_sql_stats():
+    return sql_stats.snapshot()
+
+
+@router.get("/health/cache")
+def read_cache_stats():
+    return {
+        "users": user_cache.stats(),
+        "catalogues": catalogue_cache.stats(),
+        "idempotency": response_cache.stats(),
+    }
+
+
+async def load_user_profile(db: AsyncSession, user_id: UUID) -> dict:
+    async def load(user_id: UUID) -> dict | None:
+        return await fetch_user_profile(db, user_id)
+
+    profile = await user_cache.get(user_id, load)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    return profile
+
+
+async def fetch_user_profile(db: AsyncSession, user_id: UUID) -> dict | None:
+    result = await db.execute(
+        select(
+            models.User.id,
+            models.User.surname,
+            models.User.name,
+            models.User.patronymic,
+            models.User.phone_number,
+            models.User.inn,
+            models.User.role,
+        ).where(models.User.id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return {
+        "id": row.id,
+        "surname": row.surname,
+        "name": row.name,
+        "patronymic": row.patronymic,
+        "phone_number": row.phone_number,
+        "inn": row.inn,
+        "role": row.role.value,
+    }
+
+
+def get_current_user(authorization: str | None = Header(default=None)) -> TokenClaims:
+    # Проверка токена не обращается к базе: id и роль лежат в подписанном токене
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Требуется авторизация", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        return decode_token(token, "access")
+    except TokenError as error:
+        raise HTTPException(status_code=401, detail=str(error), headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.get("/users/me")
+async def read_me(current: TokenClaims = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    return await load_user_profile(db, current.user_id)
+
+
+@router.get("/users/{user_id}")
+async def read_user(
+    user_id: UUID,
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Чужой профиль (телефон, ИНН) виден только администратору
+    if user_id != current.user_id and current.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return await load_user_profile(db, user_id)
+
+
+def rate_limited(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Слишком много запросов, попробуйте позже",
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+
+def parse_phone(raw: str) -> str:
+    try:
+        return normalize_phone(raw)
+    except PhoneError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+
+@router.post("/auth/otp", status_code=202)
+async def request_otp(payload: schemas.OtpRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Лимиты проверяются до обращения к базе
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = ip_limiter.acquire(client_ip)
+    if retry_after:
+        otp_rejected.inc(("rate_limited_ip",))
+        raise rate_limited(retry_after)
+    # Лимит по номеру считается после нормализации: «8 999...» и «+7999...» - один номер
+    phone_number = parse_phone(payload.phone_number)
+    retry_after = phone_limiter.acquire(phone_number)
+    if retry_after:
+        otp_rejected.inc(("rate_limited_phone",))
+        raise rate_limited(retry_after)
+
+    # Очередь проверяется до записи кода: при отказе в базе не остается кода, который никто не получит
+    if sms_queue.full():
+        otp_rejected.inc(("sms_queue_full",))
+        raise HTTPException(status_code=503, detail="Сервис отправки СМС перегружен")
+
+    code = generate_code()
+    otp = models.OneTimePassword(phone_number=phone_number, code_hash=hash_code(phone_number, code))
+    db.add(otp)
+    await db.commit()
+
+    # Ответ не ждет СМС-шлюз: сообщение уходит через очередь
+    if not sms_queue.submit(phone_number, otp_message(code)):
+        # Очередь заполнилась, пока шел commit: неотправленный код гасится,
+        # иначе он как последний выданный заслонил бы уже отправленные
+        otp.is_used = True
+        await db.commit()
+        otp_rejected.inc(("sms_queue_full",))
+        raise HTTPException(status_code=503, detail="Сервис отправки СМС перегружен")
+    otp_issued.inc()
+    return {"detail": "Код отправлен"}
+
+
+@router.post("/auth/login")
+async def login(payload: schemas.LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Перебор кода режется до обращения к базе; сам код гаснет после OTP_MAX_ATTEMPTS промахов
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = login_ip_limiter.acquire(client_ip)
+    if retry_after:
+        otp_rejected.inc(("login_rate_limited_ip",))
+        raise rate_limited(retry_after)
+    phone_number = parse_phone(payload.phone_number)
+    retry_after = login_phone_limiter.acquire(phone_number)
+    if retry_after:
+        otp_rejected.inc(("login_rate_limited_phone",))
+        raise rate_limited(retry_after)
+
+    result = await db.execute(verify_otp_statement(phone_number, payload.code))
+    row = result.first()
+    await db.commit()
+    if row is None:
+        otp_rejected.inc(("invalid_code",))
+        raise HTTPException(status_code=401, detail="Неверный или просроченный код")
+    otp_verified.inc()
+    return issue_token_pair(row.id, row.role)
+
+
+@router.post("/auth/refresh")
+async def refresh_tokens(payload: schemas.RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    try:
+        claims = decode_token(payload.refresh_token, "refresh")
+    except TokenError as error:
+        raise HTTPException(status_code=401, detail=str(error))
+    # Роль берется из базы, а не из токена: смена роли или удаление действуют с ближайшего обновления
+    role = await db.scalar(select(models.User.role).where(models.User.id == claims.user_id))
+    if role is None:
+        raise HTTPException(status_code=401, detail="Пользователь не найден")
+    # Refresh-токен одноразовый: старый отзывается при выдаче новой пары
+    revocations.revoke(claims)
+    return issue_token_pair(claims.user_id, role)
+
+
+@router.post("/auth/logout", status_code=204)
+def logout(payload: schemas.RefreshRequest, current: TokenClaims = Depends(get_current_user)):
+    revocations.revoke(current)
+    try:
+        claims = decode_token(payload.refresh_token, "refresh")
+    except TokenError:
+        return
+    if claims.user_id == current.user_id:
+        revocations.revoke(claims)
+
+
+@router.get("/orders/summary")
+async def orders_summary(
+    group_by: str = Query(default="order", pattern="^(" + "|".join(GROUPINGS) + ")$"),
+    customer_id: UUID | None = None,
+    order_id: UUID | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    statement = order_summary_statement(current.user_id, group_by, customer_id, order_id, date_from, date_to)
+    result = await db.execute(statement)
+    return {"group_by": group_by, "rows": [row._asdict() for row in result]}
+
+
+@router.post("/orders/import")
+async def import_orders_file(
+    request: Request,
+    format: str = Query(default="csv", pattern="^(" + "|".join(IMPORT_FORMATS) + ")$"),
+    current: TokenClaims = Depends(get_current_user),
+):
+    too_large = HTTPException(status_code=413, detail=f"Файл больше {IMPORT_MAX_BYTES} байт")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > IMPORT_MAX_BYTES:
+        raise too_large
+
+    # Тело запроса - сам файл; крупные файлы спускаются на диск, а не держатся в памяти.
+    # Content-Length может отсутствовать (chunked) или врать, поэтому байты считаются и при чтении
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as buffer:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > IMPORT_MAX_BYTES:
+                raise too_large
+            buffer.write(chunk)
+        buffer.seek(0)
+        try:
+            result = await import_file(async_engine, current.user_id, buffer, format)
+        except OrderImportError as error:
+            raise HTTPException(status_code=422, detail=str(error))
+    return {
+        "orders": result.orders,
+        "items": result.items,
+        "first_number": result.first_number,
+        "last_number": result.last_number,
+    }
+
+
+@router.get("/products/search")
+async def search_products(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=10, ge=1, le=MAX_SEARCH_LIMIT),
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await search_catalogue(db, "products", current.user_id, q, limit)
+
+
+@router.get("/customers/search")
+async def search_customers(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=10, ge=1, le=MAX_SEARCH_LIMIT),
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await search_catalogue(db, "customers", current.user_id, q, limit)
+
+
+@router.get("/customers/inn/{inn}", response_model=schemas.Customer)
+async def read_customer_by_inn(
+    inn: str,
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    try:
+        inn = normalize_inn(inn)
+    except InnError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    found = await lookup_customers(db, current.user_id, [inn])
+    if inn not in found:
+        raise HTTPException(status_code=404, detail="Заказчик не найден")
+    return OrjsonResponse(found[inn])
+
+
+@router.post("/customers/lookup")
+async def lookup_customers_by_inn(
+    payload: schemas.InnLookupRequest,
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Ответ в порядке запроса: для каждого ИНН заказчик, null или ошибка формата
+    if len(payload.inns) > MAX_LOOKUP_INNS:
+        raise HTTPException(status_code=422, detail=f"Не больше {MAX_LOOKUP_INNS} ИНН за запрос")
+    normalized = []
+    for raw in payload.inns:
+        try:
+            normalized.append((raw, normalize_inn(raw), None))
+        except InnError as error:
+            normalized.append((raw, None, str(error)))
+    found = await lookup_customers(db, current.user_id, [inn for _, inn, _ in normalized if inn])
+    return [
+        {"inn": raw, "normalized": inn, "customer": found.get(inn), "error": error}
+        for raw, inn, error in normalized
+    ]
+
+
+@router.get("/orders/export")
+async def export_orders(
+    year: int = Query(ge=2000, le=2100),
+    format: str = Query(default="csv", pattern="^(" + "|".join(EXPORT_FORMATS) + ")$"),
+    current: TokenClaims = Depends(get_current_user),
+):
+    batches = iter_batches(async_engine, export_statement(current.user_id, *year_range(year)))
+    if format == "xlsx":
+        body = xlsx_chunks(batches)
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = csv_chunks(batches)
+        media_type = "text/csv; charset=utf-8"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="orders-{year}.{format}"'},
+    )
+
+
+@router.get("/orders", response_model=schemas.OrderPage)
+async def list_orders(
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Быстрый путь: колонки -> DTO -> orjson, схема нужна только для документации
+    try:
+        page = await fetch_order_page(db, current.user_id, limit, cursor)
+    except CursorError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    return OrjsonResponse(page)
+
+
+@router.post("/orders", status_code=201, response_model=schemas.Order)
+async def create_order_route(
+    payload: schemas.OrderCreate,
+    idempotency_key: str | None = Header(default=None, min_length=1, max_length=MAX_KEY_LENGTH),
+    current: TokenClaims = Depends(get_current_user),
+):
+    # Повтор с тем же Idempotency-Key получает сохраненный ответ, новый заказ не создается
+    items = [
+        (item.product_id, item.quantity, None if item.price is None else item.price.quantize(Decimal("0.01")))
+        for item in payload.items
+    ]
+    try:
+        response, replayed = await create_order(
+            async_engine, order_numbers, current.user_id, payload.customer_id, items, idempotency_key
+        )
+    except (OrderCreateError, IdempotencyError) as error:
+        raise HTTPException(status_code=422, detail=str(error))
+    headers = {}
+    if replayed:
+        idempotent_replays.inc()
+        headers["Idempotent-Replayed"] = "true"
+    return Response(response.body, status_code=response.status_code, media_type="application/json", headers=headers)
+
+
+@router.get("/reports/revenue")
+async def revenue_report(
+    group_by: str = Query(default="customer", pattern="^(" + "|".join(ROLLUP_GROUPINGS) + ")$"),
+    month_from: date | None = None,
+    month_to: date | None = None,
+    current: TokenClaims = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await db.execute(revenue_statement(current.user_id, group_by, month_from, month_to))
+    return {"group_by": group_by, "rows": [row._asdict() for row in result]}
@@ -1,20 +1,81 @@
-from pydantic import BaseModel 
-
-class BookBase(BaseModel): 
-    title: str 
-class BookCreate(BookBase): 
-    author_id: int 
-class Book(BookBase): 
-    id: int 
-    class Config: 
-        orm_mode = True
-
-class AuthorBase(BaseModel): 
-    name: str 
-class AuthorCreate(AuthorBase): 
-    pass 
-class Author(AuthorBase): 
-    id: int 
-    books: list[Book] = [] 
-    class Config: 
-        orm_mode = True
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+from pydantic import AliasPath, BaseModel, ConfigDict, Field
+
+from .models import MAX_QUANTITY, CustomerType, UserRole
+
+# Схемы чтения собираются из ORM-объектов (from_attributes). Для больших
+# списков есть быстрый путь без ORM и Pydantic - DTO в app/orders.py;
+# JSON у обоих путей одинаковый.
+
+class ReadModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+class User(ReadModel):
+    id: UUID
+    surname: str
+    name: str
+    patronymic: str | None = None
+    phone_number: str
+    inn: str
+    role: UserRole
+
+class Product(ReadModel):
+    id: UUID
+    name: str
+    price: Decimal
+    is_countable: bool
+
+class Customer(ReadModel):
+    id: UUID
+    name: str
+    inn: str
+    customer_type: CustomerType
+
+class OrderCustomer(ReadModel):
+    id: UUID
+    name: str
+    inn: str
+
+class OrderProduct(ReadModel):
+    id: UUID
+    product_id: UUID
+    product_name: str = Field(validation_alias=AliasPath("product", "name"))
+    quantity: int
+    price: Decimal
+
+class Order(ReadModel):
+    id: UUID
+    number: int
+    created_at: datetime
+    customer: OrderCustomer
+    items: list[OrderProduct] = Field(validation_alias="orderproducts")
+
+class OrderPage(BaseModel):
+    items: list[Order]
+    next_cursor: str | None
+
+class OrderItemCreate(BaseModel):
+    product_id: UUID
+    quantity: int = Field(gt=0, le=MAX_QUANTITY)
+    # Без цены берется текущая цена товара
+    price: Decimal | None = Field(default=None, ge=0, max_digits=10, decimal_places=2)
+
+class OrderCreate(BaseModel):
+    customer_id: UUID
+    items: list[OrderItemCreate] = Field(min_length=1, max_length=500)
+
+class OtpRequest(BaseModel): 
+    phone_number: str 
+
+class LoginRequest(BaseModel): 
+    phone_number: str 
+    code: int 
+
+class RefreshRequest(BaseModel): 
+    refresh_token: str 
+
+class InnLookupRequest(BaseModel): 
+    inns: list[str] 
@@ -0,0 +1,160 @@
+import heapq
+import os
+from uuid import UUID
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .cache import LRUTTLCache
+from .models import Customer, Product
+
+# Вид справочника -> модель и дополнительное поле, которое отдается в подсказке
+CATALOGUES = {
+    "products": (Product, "price"),
+    "customers": (Customer, "inn"),
+}
+MAX_SEARCH_LIMIT = 50
+
+# Справочники не больше этого размера целиком держатся в памяти процесса
+SEARCH_CACHE_MAX_ITEMS = int(os.getenv("SEARCH_CACHE_MAX_ITEMS", "2000"))
+
+# Маркер «справочник слишком большой, искать в базе», тоже кэшируется
+_LARGE = object()
+
+
+def like_pattern(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_statement(kind: str, user_id: UUID, query: str, limit: int):
+    """Поиск подстроки без учета регистра, использует GIN-индекс (user_id, name gin_trgm_ops)
+
+    Сначала совпадения ближе к началу названия, затем более короткие названия.
+    """
+    model, extra = CATALOGUES[kind]
+    lowered = query.lower()
+    return (
+        select(model.id, model.name, getattr(model, extra))
+        .where(model.user_id == user_id, model.name.ilike(like_pattern(query), escape="\\"))
+        .order_by(func.strpos(func.lower(model.name), lowered), func.length(model.name), model.name)
+        .limit(limit)
+    )
+
+
+def match_entries(entries: list[tuple], query: str, limit: int) -> list[tuple]:
+    """Тот же порядок, что у search_statement, по загруженному в память справочнику"""
+    lowered = query.lower()
+    matches = (
+        (position, len(name), name, entry_id, extra)
+        for lowered_name, entry_id, name, extra in entries
+        if (position := lowered_name.find(lowered)) >= 0
+    )
+    return [
+        (entry_id, name, extra)
+        for _, _, name, entry_id, extra in heapq.nsmallest(limit, matches, key=lambda match: match[:3])
+    ]
+
+
+class CatalogueCache:
+    """Справочники небольших пользователей в памяти процесса
+
+    Ключ - (вид, user_id). Для больших справочников хранится только маркер,
+    чтобы не считать их размер на каждое нажатие клавиши.
+    """
+
+    def __init__(self, local: LRUTTLCache, max_items: int):
+        self.local = local
+        self.max_items = max_items
+        self.database_searches = 0
+
+    async def load(self, db: AsyncSession, kind: str, user_id: UUID):
+        model, extra = CATALOGUES[kind]
+        rows = (await db.execute(
+            select(model.id, model.name, getattr(model, extra))
+            .where(model.user_id == user_id)
+            .limit(self.max_items + 1)
+        )).all()
+        if len(rows) > self.max_items:
+            return _LARGE
+        return [(name.lower(), entry_id, name, value) for entry_id, name, value in rows]
+
+    async def search(self, db: AsyncSession, kind: str, user_id: UUID, query: str, limit: int) -> list[tuple]:
+        key = (kind, user_id)
+        entries = self.local.get(key, None)
+        if entries is None:
+            entries = await self.load(db, kind, user_id)
+            self.local.set(key, entries)
+        if entries is not _LARGE:
+            return match_entries(entries, query, limit)
+        self.database_searches += 1
+        return (await db.execute(search_statement(kind, user_id, query, limit))).all()
+
+    def invalidate(self, keys) -> None:
+        for key in keys:
+            self.local.delete(key)
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        stats["database_searches"] = self.database_searches
+        return stats
+
+
+catalogue_cache = CatalogueCache(
+    LRUTTLCache(
+        maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "1000")),
+        ttl=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "60")),
+    ),
+    max_items=SEARCH_CACHE_MAX_ITEMS,
+)
+
+
+async def search_catalogue(db: AsyncSession, kind: str, user_id: UUID, query: str, limit: int) -> list[dict]:
+    _, extra = CATALOGUES[kind]
+    rows = await catalogue_cache.search(db, kind, user_id, query, limit)
+    return [{"id": entry_id, "name": name, extra: value} for entry_id, name, value in rows]
+
+
+# Инвалидация как у кэша профилей: (вид, user_id) копятся при flush и
+# сбрасываются после commit; массовые изменения через ORM сбрасывают все.
+# Изменения в обход ORM видны не позже чем через SEARCH_CACHE_TTL_SECONDS.
+
+_PENDING_KEY = "catalogue_cache_pending"
+_KINDS = {model: kind for kind, (model, _) in CATALOGUES.items()}
+_ALL = object()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_catalogues(session, flush_context):
+    changed = {
+        (_KINDS[type(obj)], obj.user_id)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in _KINDS
+    }
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_catalogue_changes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in _KINDS:
+            orm_execute_state.session.info.setdefault(_PENDING_KEY, set()).add(_ALL)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_catalogues(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _ALL in pending:
+        catalogue_cache.local.clear()
+        return
+    catalogue_cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending_catalogues(session):
+    session.info.pop(_PENDING_KEY, None)
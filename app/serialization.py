@@ -0,0 +1,67 @@
+import functools
+import inspect
+from decimal import Decimal
+from uuid import UUID
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.responses import Response
+
+# Как у Pydantic: время UTC с «Z», Decimal строкой без потери точности
+DUMPS_OPTIONS = orjson.OPT_UTC_Z
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    # asyncpg отдает свой подкласс UUID, orjson понимает только uuid.UUID
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dumps(content) -> bytes:
+    """JSON через orjson: dataclass (в том числе со slots), UUID и datetime без промежуточных dict"""
+    return orjson.dumps(content, default=_default, option=DUMPS_OPTIONS)
+
+
+class OrjsonResponse(JSONResponse):
+    """Ответ по умолчанию для приложения (app/main.py)"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class OrjsonRoute(APIRoute):
+    """Маршрут без response_model отдает возвращенное значение прямо в orjson
+
+    Иначе FastAPI сначала прогоняет dict или список через jsonable_encoder: он
+    обходит все значения в Python и превращает Decimal во float. Здесь результат
+    оборачивается в OrjsonResponse еще в обработчике, поэтому данные
+    сериализуются один раз и деньги остаются точными. Маршруты с response_model
+    по-прежнему проверяются и сериализуются Pydantic, Response и None
+    проходят как есть.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, self._wrap(endpoint), **kwargs)
+
+    def _render(self, content):
+        if content is None or isinstance(content, Response) or self.response_field is not None:
+            return content
+        return OrjsonResponse(content, status_code=self.status_code or 200)
+
+    def _wrap(self, endpoint):
+        # Генераторы FastAPI отдает потоком сам; сигнатуру для зависимостей он берет через __wrapped__
+        if inspect.isasyncgenfunction(endpoint) or inspect.isgeneratorfunction(endpoint):
+            return endpoint
+        if inspect.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def call(*args, **kwargs):
+                return self._render(await endpoint(*args, **kwargs))
+        else:
+            @functools.wraps(endpoint)
+            def call(*args, **kwargs):
+                return self._render(endpoint(*args, **kwargs))
+        return call
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+
+import httpx
+
+from .database import env_bool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SmsMessage:
+    phone_number: str
+    text: str
+    attempt: int = 0
+
+
+class SmsSender(ABC):
+    """Интерфейс отправителя СМС: получает пачку сообщений за один вызов"""
+
+    @abstractmethod
+    async def send_batch(self, messages: list[SmsMessage]) -> list[SmsMessage]:
+        """Отправляет сообщения, возвращает те, которые нужно повторить"""
+
+    async def close(self) -> None:
+        pass
+
+
+class OvrxSmsSender(SmsSender):
+    """Отправка через msg.ovrx.ru
+
+    Формат запроса взят по аналогии с типовыми SMS-шлюзами (JSON со списком
+    сообщений); при получении документации сервиса его нужно сверить.
+    """
+
+    def __init__(self, api_url: str, api_key: str, sender_name: str | None = None, timeout: float = 10.0):
+        self.api_url = api_url
+        self.sender_name = sender_name
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            headers={"Authorization": f"Bearer {api_key}"},
+        )
+
+    async def send_batch(self, messages: list[SmsMessage]) -> list[SmsMessage]:
+        payload = {
+            "messages": [
+                {"phone": message.phone_number, "text": message.text, "sender": self.sender_name}
+                for message in messages
+            ]
+        }
+        try:
+            response = await self._client.post(self.api_url, json=payload)
+        except httpx.HTTPError as error:
+            logger.warning("msg.ovrx.ru недоступен: %s", error)
+            return messages
+        # 5xx и 429 - временные ошибки, остальные повторять бессмысленно
+        if response.status_code >= 500 or response.status_code == 429:
+            logger.warning("msg.ovrx.ru ответил %s", response.status_code)
+            return messages
+        if response.status_code >= 400:
+            logger.error("msg.ovrx.ru отклонил пачку: %s %s", response.status_code, response.text)
+        return []
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+class FakeSmsSender(SmsSender):
+    """Локальная заглушка для разработки и тестов: хранит последние max_sent сообщений"""
+
+    def __init__(self, fail_times: int = 0, max_sent: int = 1000):
+        self.sent: deque[SmsMessage] = deque(maxlen=max_sent)
+        self.fail_times = fail_times
+
+    async def send_batch(self, messages: list[SmsMessage]) -> list[SmsMessage]:
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            return messages
+        self.sent.extend(messages)
+        return []
+
+
+class SmsQueue:
+    """Асинхронная очередь исходящих СМС с пачками, повторами и ограниченным числом воркеров"""
+
+    def __init__(
+        self,
+        sender: SmsSender,
+        workers: int = 4,
+        batch_size: int = 50,
+        batch_interval: float = 0.05,
+        max_attempts: int = 5,
+        retry_delay: float = 0.5,
+        max_size: int = 10_000,
+    ):
+        self.sender = sender
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue[SmsMessage] = asyncio.Queue(maxsize=max_size)
+        self._tasks: list[asyncio.Task] = []
+        self._retry_tasks: set[asyncio.Task] = set()
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def submit(self, phone_number: str, text: str) -> bool:
+        """Ставит сообщение в очередь не дожидаясь отправки; False, если очередь переполнена"""
+        try:
+            self._queue.put_nowait(SmsMessage(phone_number, text))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def start(self) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self) -> None:
+        """Дожидается отправки накопленных сообщений и останавливает воркеров"""
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        for task in list(self._retry_tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retry_tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.sender.close()
+
+    async def _collect_batch(self) -> list[SmsMessage]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            try:
+                failed = await self.sender.send_batch(batch)
+            except Exception:
+                logger.exception("Ошибка отправки пачки СМС")
+                failed = batch
+            retried = {id(message) for message in failed if self._schedule_retry(message)}
+            # Отложенные повторы закрывают свою задачу сами после возврата в очередь,
+            # поэтому join() в stop() дожидается и их
+            for message in batch:
+                if id(message) not in retried:
+                    self._queue.task_done()
+
+    def _schedule_retry(self, message: SmsMessage) -> bool:
+        message.attempt += 1
+        if message.attempt >= self.max_attempts:
+            logger.error("СМС на %s не отправлено после %s попыток", message.phone_number, message.attempt)
+            return False
+        delay = self.retry_delay * 2 ** (message.attempt - 1)
+        task = asyncio.create_task(self._requeue(message, delay))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+        return True
+
+    async def _requeue(self, message: SmsMessage, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._queue.put(message)
+        self._queue.task_done()
+
+
+def create_sms_sender() -> SmsSender:
+    """Выбирает отправителя по окружению; заглушка - только явно, через SMS_FAKE=true
+
+    Без ключа и без SMS_FAKE приложение не стартует: иначе коды молча
+    складывались бы в память процесса, а пользователи их не получали.
+    """
+    if env_bool("SMS_FAKE", False):
+        logger.warning("SMS_FAKE=true: СМС не отправляются, коды остаются в памяти процесса")
+        return FakeSmsSender()
+    api_key = os.getenv("SMS_API_KEY")
+    if not api_key:
+        raise RuntimeError("SMS_API_KEY не задан; для разработки без шлюза задайте SMS_FAKE=true")
+    return OvrxSmsSender(
+        api_url=os.getenv("SMS_API_URL", "https://msg.ovrx.ru/api/send"),
+        api_key=api_key,
+        sender_name=os.getenv("SMS_SENDER_NAME"),
+    )
+
+
+sms_queue = SmsQueue(
+    create_sms_sender(),
+    workers=int(os.getenv("SMS_WORKERS", "4")),
+    batch_size=int(os.getenv("SMS_BATCH_SIZE", "50")),
+)
@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from uuid import UUID
+
+from .models import UserRole
+
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", "900"))
+REFRESH_TOKEN_TTL = int(os.getenv("REFRESH_TOKEN_TTL_SECONDS", str(30 * 24 * 3600)))
+
+_secret = os.getenv("AUTH_SECRET_KEY")
+if not _secret:
+    # Случайный ключ процесса молча ломает токены между воркерами и хэши OTP после перезапуска
+    raise RuntimeError("AUTH_SECRET_KEY не задан: без общего ключа нельзя подписывать токены и хэшировать коды")
+SECRET_KEY = _secret.encode()
+
+# Заголовок JWT с HS256 не меняется, поэтому кодируется один раз
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+
+class TokenError(Exception):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class TokenClaims:
+    user_id: UUID
+    role: UserRole
+    token_type: str
+    jti: str
+    issued_at: int
+    expires_at: int
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def sign(signing_input: bytes) -> bytes:
+    return b64encode(hmac.new(SECRET_KEY, signing_input, hashlib.sha256).digest())
+
+
+def encode_token(user_id: UUID, role: UserRole, token_type: str, ttl: int, now: int | None = None) -> str:
+    now = int(time.time()) if now is None else now
+    payload = {
+        "sub": str(user_id),
+        "role": role.value,
+        "typ": token_type,
+        "jti": secrets.token_urlsafe(12),
+        "iat": now,
+        "exp": now + ttl,
+    }
+    signing_input = _HEADER + b"." + b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return (signing_input + b"." + sign(signing_input)).decode()
+
+
+def decode_token(token: str, token_type: str, now: int | None = None) -> TokenClaims:
+    """Проверяет подпись, срок и отзыв токена; к базе не обращается"""
+    try:
+        raw = token.encode("ascii")
+        signing_input, _, signature = raw.rpartition(b".")
+        header, _, body = signing_input.partition(b".")
+    except UnicodeEncodeError:
+        raise TokenError("Некорректный токен")
+    if header != _HEADER or not body or not hmac.compare_digest(sign(signing_input), signature):
+        raise TokenError("Некорректный токен")
+
+    try:
+        payload = json.loads(b64decode(body))
+        claims = TokenClaims(
+            user_id=UUID(payload["sub"]),
+            role=UserRole(payload["role"]),
+            token_type=payload["typ"],
+            jti=payload["jti"],
+            issued_at=payload["iat"],
+            expires_at=payload["exp"],
+        )
+    except (ValueError, KeyError, TypeError):
+        raise TokenError("Некорректный токен")
+
+    now = int(time.time()) if now is None else now
+    if claims.token_type != token_type:
+        raise TokenError("Неверный тип токена")
+    if claims.expires_at <= now:
+        raise TokenError("Срок действия токена истек")
+    if revocations.is_revoked(claims):
+        raise TokenError("Токен отозван")
+    return claims
+
+
+class RevocationList:
+    """Отозванные токены в памяти процесса
+
+    Хранятся только jti (16 байт дайджеста) со сроком истечения: после exp
+    токен и так недействителен, поэтому запись удаляется при очистке.
+    Смена роли и удаление пользователя отдельного отзыва не требуют:
+    /auth/refresh перечитывает роль из базы.
+    """
+
+    def __init__(self):
+        self._tokens: dict[bytes, int] = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0
+
+    @staticmethod
+    def _key(jti: str) -> bytes:
+        return hashlib.blake2b(jti.encode(), digest_size=16).digest()
+
+    def revoke(self, claims: TokenClaims) -> None:
+        with self._lock:
+            self._tokens[self._key(claims.jti)] = claims.expires_at
+        self._purge()
+
+    def is_revoked(self, claims: TokenClaims) -> bool:
+        return bool(self._tokens) and self._key(claims.jti) in self._tokens
+
+    def _purge(self) -> None:
+        now = int(time.time())
+        if now < self._next_purge:
+            return
+        with self._lock:
+            self._next_purge = now + 60
+            self._tokens = {key: exp for key, exp in self._tokens.items() if exp > now}
+
+
+revocations = RevocationList()
+
+
+def issue_token_pair(user_id: UUID, role: UserRole) -> dict:
+    return {
+        "access_token": encode_token(user_id, role, "access", ACCESS_TOKEN_TTL),
+        "refresh_token": encode_token(user_id, role, "refresh", REFRESH_TOKEN_TTL),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL,
+    }
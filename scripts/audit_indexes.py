@@ -0,0 +1,83 @@
+"""Аудит индексов: сверка с моделями, дубликаты и неиспользуемые индексы
+
+Сравнивает индексы из app/models.py с живыми индексами базы и счетчиками
+pg_stat_user_indexes. Счетчики свои у каждого сервера: на репликах запросы
+идут мимо primary, поэтому перед удалением «неиспользуемого» индекса стоит
+запустить аудит и там.
+    python -m scripts.audit_indexes
+    python -m scripts.audit_indexes --max-scans 10
+
+Код выхода 1, если найдены лишние индексы или расхождения с моделями.
+"""
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import text
+
+from app.database import async_engine
+from app.index_audit import (
+    STATS_SINCE_SQL,
+    compare_declared,
+    find_redundant,
+    find_unused,
+    live_indexes,
+)
+from app.models import Base
+
+
+def describe(index) -> str:
+    line = f"{index.table_name}.{index.index_name} {index.method} ({', '.join(index.key_columns)})"
+    if index.include_columns:
+        line += f" INCLUDE ({', '.join(index.include_columns)})"
+    if index.predicate:
+        line += f" WHERE {index.predicate}"
+    return line
+
+
+def size(size_bytes: int) -> str:
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.0f} kB"
+    return f"{size_bytes / 1024 / 1024:.1f} MB"
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-scans", type=int, default=0, help="индекс с idx_scan не больше этого считается неиспользуемым")
+    args = parser.parse_args()
+
+    try:
+        async with async_engine.connect() as connection:
+            indexes = await live_indexes(connection)
+            stats_since = await connection.scalar(STATS_SINCE_SQL)
+            database = await connection.scalar(text("SELECT current_database()"))
+    finally:
+        await async_engine.dispose()
+
+    print(f"База {database}: {len(indexes)} индексов, {size(sum(index.size_bytes for index in indexes))}")
+
+    missing, undeclared = compare_declared(indexes, Base.metadata)
+    print(f"\nОбъявлены в моделях, но нет в базе ({len(missing)}):")
+    for table, name in missing:
+        print(f"  {table}.{name}")
+    print(f"\nЕсть в базе, но не объявлены в моделях ({len(undeclared)}):")
+    for table, name in undeclared:
+        print(f"  {table}.{name}")
+
+    redundant = find_redundant(indexes)
+    print(f"\nЛишние: повторяют другой индекс или его начало ({len(redundant)}):")
+    for index, covering in redundant:
+        print(f"  {describe(index)}, {size(index.size_bytes)}")
+        print(f"    покрыт {covering.index_name}")
+
+    unused = find_unused(indexes, args.max_scans)
+    print(f"\nНе используются с {stats_since:%Y-%m-%d %H:%M}, idx_scan <= {args.max_scans} ({len(unused)}):")
+    for index in unused:
+        print(f"  {describe(index)}, {size(index.size_bytes)}, сканирований: {index.scans}")
+
+    if missing or undeclared or redundant:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""Сериализация списка заказов: jsonable_encoder + json против Pydantic и orjson
+
+Страница из --orders заказов по --items позиций собирается в памяти (UUID,
+Decimal, datetime с часовым поясом), база не нужна. Сравниваются:
+    stdlib      - путь FastAPI по умолчанию: jsonable_encoder + JSONResponse
+    pydantic    - schemas.OrderPage.model_dump_json()
+    orjson dict - OrjsonResponse с тем же dict
+    orjson DTO  - OrjsonResponse с DTO из app/orders.py (как GET /orders)
+    python -m scripts.bench_json --orders 100
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app import schemas
+from app.ids import uuid7
+from app.orders import OrderCustomerRow, OrderItemRow, OrderPageRows, OrderRow
+from app.serialization import OrjsonResponse
+
+
+def make_page(orders: int, items: int) -> OrderPageRows:
+    created_at = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+    customer = OrderCustomerRow(uuid7(), 'ООО "Ромашка"', "7707083893")
+    return OrderPageRows(
+        [
+            OrderRow(
+                uuid7(),
+                number,
+                created_at - timedelta(minutes=number),
+                customer,
+                [
+                    OrderItemRow(uuid7(), uuid7(), "Юридическая консультация", 3, Decimal("12345.67") + line)
+                    for line in range(items)
+                ],
+            )
+            for number in range(orders)
+        ],
+        "MjAyNi0xMC0xOFQxMjowMDowMCswMDowMHwx",
+    )
+
+
+def as_dict(page: OrderPageRows) -> dict:
+    return {
+        "items": [
+            {
+                "id": order.id,
+                "number": order.number,
+                "created_at": order.created_at,
+                "customer": {"id": order.customer.id, "name": order.customer.name, "inn": order.customer.inn},
+                "items": [
+                    {
+                        "id": item.id,
+                        "product_id": item.product_id,
+                        "product_name": item.product_name,
+                        "quantity": item.quantity,
+                        "price": item.price,
+                    }
+                    for item in order.items
+                ],
+            }
+            for order in page.items
+        ],
+        "next_cursor": page.next_cursor,
+    }
+
+
+def rate(render, seconds: float) -> tuple[float, int]:
+    body = render()
+    count = 0
+    started = time.perf_counter()
+    while (elapsed := time.perf_counter() - started) < seconds:
+        render()
+        count += 1
+    return count / elapsed, len(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    page = make_page(args.orders, args.items)
+    payload = as_dict(page)
+    model = schemas.OrderPage.model_validate(payload)
+    renders = {
+        "stdlib": lambda: JSONResponse(jsonable_encoder(payload)).body,
+        "pydantic": lambda: model.model_dump_json().encode(),
+        "orjson dict": lambda: OrjsonResponse(payload).body,
+        "orjson DTO": lambda: OrjsonResponse(page).body,
+    }
+
+    # Деньги: stdlib превращает Decimal во float, остальные отдают строку как есть
+    for name, render in renders.items():
+        price = json.loads(render())["items"][0]["items"][0]["price"]
+        print(f"{name:12} цена первой позиции: {price!r}")
+
+    print(f"\nСтраница: {args.orders} заказов по {args.items} позиции")
+    baseline = None
+    for name, render in renders.items():
+        pages, size = rate(render, args.seconds)
+        baseline = baseline or pages
+        print(
+            f"{name:12} {pages:9,.0f} стр/с  {pages * size / 1024 / 1024:7.1f} МБ/с  "
+            f"{1e6 / pages:8.1f} мкс/стр  x{pages / baseline:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
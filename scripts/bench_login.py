@@ -0,0 +1,85 @@
+"""Нагрузочный тест проверки OTP: задержка /auth/login при росте one_time_passwords до 10 млн строк
+
+Таблица дозаполняется синтетическими кодами через INSERT ... SELECT generate_series,
+на каждом уровне замеряется один и тот же UPDATE ... RETURNING, что и в POST /auth/login.
+Запуск на тестовой базе (строки не удаляются):
+    python -m scripts.bench_login --levels 100000,1000000,10000000 --samples 500
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, text
+
+from app.database import engine
+from app.models import OneTimePassword, User
+from app.otp import hash_code, verify_otp_statement
+
+FILL_SQL = text("""
+    INSERT INTO one_time_passwords (id, phone_number, code_hash, created_at, is_used)
+    SELECT gen_random_uuid(),
+           '+79' || lpad((random() * 999999999)::bigint::text, 9, '0'),
+           (random() * 9e18)::bigint,
+           now() - random() * interval '180 days',
+           random() < 0.7
+    FROM generate_series(1, :count)
+""")
+
+
+def table_size(connection) -> int:
+    return connection.execute(text("SELECT count(*) FROM one_time_passwords")).scalar()
+
+
+def fill_to(connection, target: int, chunk: int = 1_000_000) -> None:
+    current = table_size(connection)
+    while current < target:
+        count = min(chunk, target - current)
+        connection.execute(FILL_SQL, {"count": count})
+        connection.commit()
+        current += count
+    connection.execute(text("ANALYZE one_time_passwords"))
+    connection.commit()
+
+
+def measure(connection, phone_number: str, samples: int) -> list[float]:
+    timings = []
+    for i in range(samples):
+        code = 1000 + i % 9000
+        connection.execute(insert(OneTimePassword).values(
+            phone_number=phone_number, code_hash=hash_code(phone_number, code), created_at=datetime.now(timezone.utc), is_used=False,
+        ))
+        connection.commit()
+
+        started = time.perf_counter()
+        row = connection.execute(verify_otp_statement(phone_number, code)).first()
+        connection.commit()
+        timings.append(time.perf_counter() - started)
+        assert row is not None, "код не подтвердился"
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="100000,1000000,10000000")
+    parser.add_argument("--samples", type=int, default=500)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        phone_number = connection.execute(select(User.phone_number).limit(1)).scalar()
+        if phone_number is None:
+            print("В таблице users нет записей, примените миграции: alembic upgrade head")
+            return
+
+        print(f"{'строк':>12} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+        for level in (int(x) for x in args.levels.split(",")):
+            fill_to(connection, level)
+            timings = sorted(measure(connection, phone_number, args.samples))
+            p50 = statistics.median(timings) * 1000
+            p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+            p99 = timings[int(len(timings) * 0.99) - 1] * 1000
+            print(f"{table_size(connection):>12} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Накладные расходы сбора метрик на запрос: MetricsMiddleware вокруг пустого ASGI-приложения
+
+Сравнивается время вызова пустого приложения напрямую и через прослойку,
+разница - цена метрик на один запрос. К базе скрипт не подключается:
+    python -m scripts.bench_metrics --requests 200000
+"""
+import argparse
+import asyncio
+import time
+
+from app.metrics import MetricsMiddleware
+
+
+class Route:
+    path = "/orders/{order_id}"
+
+
+async def empty_app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def run(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/orders/1"}
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    plain = asyncio.run(run(empty_app, args.requests))
+    measured = asyncio.run(run(MetricsMiddleware(empty_app), args.requests))
+    print(f"без метрик:  {plain * 1e6:.2f} мкс на запрос")
+    print(f"с метриками: {measured * 1e6:.2f} мкс на запрос")
+    print(f"цена метрик: {(measured - plain) * 1e6:.2f} мкс на запрос")
+
+
+if __name__ == "__main__":
+    main()
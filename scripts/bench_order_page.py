@@ -0,0 +1,110 @@
+"""Страница из 1000 заказов: ORM + Pydantic против колонок в DTO + orjson
+
+Заказы пользователя с наибольшим числом заказов размножаются во временные
+копии до --orders штук, после замера копии удаляются. В замер входит весь
+путь от запроса до готовых байт JSON. Запуск на тестовой базе:
+    python -m scripts.bench_order_page --orders 1000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import func, select
+
+from app import schemas
+from app.database import AsyncSessionLocal, SessionLocal, async_engine
+from app.models import Order
+from app.orders import fetch_order_page, next_cursor, order_page_statement
+from app.serialization import dumps
+
+# Выполняется одним вызовом драйвера (psycopg2), параметры в его формате
+COPY_ORDERS_SQL = """
+    CREATE TEMP TABLE bench_page_map ON COMMIT PRESERVE ROWS AS
+    SELECT gen_random_uuid() AS id, o.id AS source_id, o.user_id,
+           o.number + copy * 100000 AS number, o.created_at - copy * interval '1 minute' AS created_at,
+           o.customer_id
+    FROM orders o CROSS JOIN generate_series(1, %(copies)s) AS copy
+    WHERE o.user_id = %(user_id)s;
+
+    INSERT INTO orders (id, number, created_at, customer_id, user_id)
+    SELECT id, number, created_at, customer_id, user_id FROM bench_page_map;
+
+    INSERT INTO order_products (id, quantity, price, order_id, product_id)
+    SELECT gen_random_uuid(), op.quantity, op.price, m.id, op.product_id
+    FROM bench_page_map m JOIN order_products op ON op.order_id = m.source_id;
+
+    ANALYZE orders;
+    ANALYZE order_products;
+"""
+
+CLEANUP_SQL = """
+    DELETE FROM orders WHERE id IN (SELECT id FROM bench_page_map);
+    DROP TABLE bench_page_map;
+"""
+
+
+async def orm_page(db, user_id, limit: int) -> bytes:
+    orders = (await db.scalars(order_page_statement(user_id, limit))).unique().all()
+    orders, cursor = next_cursor(orders, limit)
+    page = schemas.OrderPage(items=[schemas.Order.model_validate(order) for order in orders], next_cursor=cursor)
+    return page.model_dump_json().encode()
+
+
+async def dto_page(db, user_id, limit: int) -> bytes:
+    return dumps(await fetch_order_page(db, user_id, limit))
+
+
+async def measure(path, user_id, limit: int, repeat: int) -> tuple[list[float], int, int]:
+    timings = []
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            body = await path(db, user_id, limit)
+            timings.append(time.perf_counter() - started)
+    async with AsyncSessionLocal() as db:
+        tracemalloc.start()
+        await path(db, user_id, limit)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return timings, len(body), peak
+
+
+async def run(user_id, limit: int, repeat: int) -> None:
+    try:
+        for name, path in (("ORM + Pydantic", orm_page), ("DTO + orjson", dto_page)):
+            timings, size, peak = await measure(path, user_id, limit, repeat)
+            print(
+                f"{name:15} медиана {statistics.median(timings) * 1000:7.1f} мс, "
+                f"лучшее {min(timings) * 1000:7.1f} мс, ответ {size / 1024:.0f} КБ, "
+                f"пик памяти {peak / 1024 / 1024:.1f} МБ"
+            )
+    finally:
+        await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        user_id, orders = session.execute(
+            select(Order.user_id, func.count()).group_by(Order.user_id).order_by(func.count().desc()).limit(1)
+        ).one()
+        copies = -(-args.orders // orders)
+        session.connection().exec_driver_sql(COPY_ORDERS_SQL, {"copies": copies, "user_id": user_id})
+        session.commit()
+        try:
+            print(f"пользователь: {orders * (copies + 1)} заказов, страница: {args.orders}")
+            asyncio.run(run(user_id, args.orders, args.repeat))
+        finally:
+            session.rollback()
+            session.connection().exec_driver_sql(CLEANUP_SQL)
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
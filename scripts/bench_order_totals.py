@@ -0,0 +1,100 @@
+"""Сравнение подсчета сумм заказов: цикл по ORM-объектам против GROUP BY в Postgres
+
+Данные сида (150 заказов) размножаются в --scale раз во временные копии,
+после замера копии удаляются. Запуск на тестовой базе:
+    python -m scripts.bench_order_totals --scale 1000
+"""
+import argparse
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+
+from app.database import SessionLocal
+from app.models import Order, OrderProduct
+from app.reports import order_summary_statement
+
+# Выполняется одним вызовом драйвера (psycopg2), параметры в его формате
+COPY_ORDERS_SQL = """
+    CREATE TEMP TABLE bench_order_map ON COMMIT PRESERVE ROWS AS
+    SELECT gen_random_uuid() AS id, o.id AS source_id, o.user_id,
+           o.number + copy * 1000 AS number, o.created_at, o.customer_id
+    FROM orders o CROSS JOIN generate_series(1, %(scale)s) AS copy;
+
+    INSERT INTO orders (id, number, created_at, customer_id, user_id)
+    SELECT id, number, created_at, customer_id, user_id FROM bench_order_map;
+
+    INSERT INTO order_products (id, quantity, price, order_id, product_id)
+    SELECT gen_random_uuid(), op.quantity, op.price, m.id, op.product_id
+    FROM bench_order_map m JOIN order_products op ON op.order_id = m.source_id;
+
+    ANALYZE orders;
+    ANALYZE order_products;
+"""
+
+CLEANUP_SQL = """
+    DELETE FROM orders WHERE id IN (SELECT id FROM bench_order_map);
+    DROP TABLE bench_order_map;
+"""
+
+
+def orm_totals(session, user_id) -> dict:
+    """Подход «в лоб»: загрузить все заказы с позициями и сложить в Python"""
+    orders = session.scalars(
+        select(Order).where(Order.user_id == user_id).options(selectinload(Order.orderproducts))
+    ).all()
+    totals = defaultdict(Decimal)
+    for order in orders:
+        for item in order.orderproducts:
+            totals[order.id] += item.quantity * item.price
+    return totals
+
+
+def sql_totals(session, user_id) -> dict:
+    return {row.order_id: row.total for row in session.execute(order_summary_statement(user_id, "order"))}
+
+
+def timed(func, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+        args[0].expunge_all()
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        session.connection().exec_driver_sql(COPY_ORDERS_SQL, {"scale": args.scale})
+        session.commit()
+        try:
+            user_id = session.scalar(
+                select(Order.user_id).group_by(Order.user_id).order_by(func.count().desc()).limit(1)
+            )
+            orders = session.scalar(select(func.count()).where(Order.user_id == user_id))
+            items = session.scalar(
+                select(func.count()).select_from(OrderProduct).join(Order).where(Order.user_id == user_id)
+            )
+            assert orm_totals(session, user_id) == sql_totals(session, user_id)
+            session.expunge_all()
+
+            orm_seconds = timed(orm_totals, session, user_id)
+            sql_seconds = timed(sql_totals, session, user_id)
+            print(f"пользователь: {orders} заказов, {items} позиций")
+            print(f"ORM + Python: {orm_seconds * 1000:9.1f} мс")
+            print(f"GROUP BY:     {sql_seconds * 1000:9.1f} мс  (x{orm_seconds / sql_seconds:.1f})")
+        finally:
+            session.rollback()
+            session.connection().exec_driver_sql(CLEANUP_SQL)
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
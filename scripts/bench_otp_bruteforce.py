@@ -0,0 +1,110 @@
+"""Пропускная способность проверки OTP под перебором: поток неверных кодов с заданной частотой
+
+Для --phones номеров пользователей создаются живые коды (по сценарию сида:
+несколько кодов на номер, включая повторяющиеся), затем асинхронные воркеры
+с частотой --rate попыток в секунду шлют тот же запрос, что и POST /auth/login,
+с кодами, которые заведомо не подходят. После OTP_MAX_ATTEMPTS промахов коды
+гаснут, дальше перебор идет по пустому индексу; в конце проверяется, что и
+верный код уже не проходит. Созданные коды удаляются. Запуск на тестовой базе:
+    python -m scripts.bench_otp_bruteforce --rate 10000 --duration 10 --phones 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, select
+
+LIVE_CODES = (1234, 1234, 4321)
+
+
+def hash_throughput(rounds: int = 200_000) -> float:
+    from app.otp import hash_code
+
+    started = time.perf_counter()
+    for i in range(rounds):
+        hash_code("+79991234567", 1000 + i % 9000)
+    return rounds / (time.perf_counter() - started)
+
+
+async def attack(phones: list[str], rate: float, duration: float, concurrency: int) -> tuple[list[float], float, int]:
+    from app.database import async_engine
+    from app.otp import verify_otp_statement
+
+    wrong_codes = [code for code in range(1000, 10000) if code not in LIVE_CODES]
+    total = int(rate * duration)
+    latencies: list[float] = []
+    accepted = 0
+    next_attempt = 0
+    started = time.perf_counter()
+
+    async def worker() -> None:
+        nonlocal next_attempt, accepted
+        while next_attempt < total:
+            attempt = next_attempt
+            next_attempt += 1
+            # Попытки идут по расписанию: отставание от него тоже попадает в задержку
+            scheduled = started + attempt / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            phone = phones[attempt % len(phones)]
+            code = wrong_codes[attempt % len(wrong_codes)]
+            async with async_engine.begin() as connection:
+                row = (await connection.execute(verify_otp_statement(phone, code))).first()
+            latencies.append(time.perf_counter() - scheduled)
+            accepted += row is not None
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        async with async_engine.begin() as connection:
+            after = (await connection.execute(verify_otp_statement(phones[0], LIVE_CODES[0]))).first()
+        assert after is None, "верный код прошел после исчерпания попыток"
+    finally:
+        await async_engine.dispose()
+    return latencies, elapsed, accepted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10_000, help="попыток в секунду")
+    parser.add_argument("--duration", type=float, default=10, help="секунд")
+    parser.add_argument("--phones", type=int, default=1, help="сколько номеров атакуется одновременно")
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+    from app.models import OneTimePassword, User
+    from app.otp import hash_code
+
+    with SessionLocal() as session:
+        phones = session.scalars(select(User.phone_number).order_by(User.phone_number).limit(args.phones)).all()
+        now = datetime.now(timezone.utc)
+        ids = session.scalars(insert(OneTimePassword).returning(OneTimePassword.id), [
+            {"phone_number": phone, "code_hash": hash_code(phone, code), "created_at": now, "is_used": False}
+            for phone in phones for code in LIVE_CODES
+        ]).all()
+        session.commit()
+
+    print(f"хэш кодов: {hash_throughput():,.0f} в секунду в одном потоке")
+    try:
+        latencies, elapsed, accepted = asyncio.run(attack(phones, args.rate, args.duration, args.concurrency))
+    finally:
+        with SessionLocal() as session:
+            session.execute(delete(OneTimePassword).where(OneTimePassword.id.in_(ids)))
+            session.commit()
+
+    latencies.sort()
+    print(f"номеров: {len(phones)}, живых кодов на номер: {len(LIVE_CODES)}")
+    print(f"попыток: {len(latencies)} за {elapsed:.1f} с, {len(latencies) / elapsed:,.0f} в секунду (цель {args.rate:,.0f})")
+    print(f"задержка от расписания, мс: p50 {statistics.median(latencies) * 1000:.1f}, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}")
+    print(f"принято неверных кодов: {accepted}")
+    assert accepted == 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Задержка поиска по справочнику услуг: GIN-индекс pg_trgm против кэша процесса
+
+Одному пользователю временно добавляется --products услуг (названия сида с
+номерами), после замера они удаляются. Запуск на тестовой базе:
+    python -m scripts.bench_search --products 1000000
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import select, text
+
+from app.database import SessionLocal
+from app.models import Product, User
+from app.search import SEARCH_CACHE_MAX_ITEMS, match_entries, search_statement
+
+# Выполняется одним вызовом драйвера (psycopg2), параметры в его формате
+COPY_PRODUCTS_SQL = """
+    CREATE TEMP TABLE bench_product_ids ON COMMIT PRESERVE ROWS AS
+    SELECT gen_random_uuid() AS id, n FROM generate_series(1, %(count)s) AS n;
+
+    CREATE TEMP TABLE bench_product_seed ON COMMIT DROP AS
+    SELECT row_number() OVER (ORDER BY id) - 1 AS k, name, price, is_countable FROM products;
+
+    INSERT INTO products (id, name, price, is_countable, user_id)
+    SELECT b.id, s.name || ' ' || b.n, s.price, s.is_countable, %(user_id)s
+    FROM bench_product_ids b
+    JOIN bench_product_seed s ON s.k = b.n %% (SELECT count(*) FROM bench_product_seed);
+
+    ANALYZE products;
+"""
+
+CLEANUP_SQL = """
+    DELETE FROM products WHERE id IN (SELECT id FROM bench_product_ids);
+    DROP TABLE bench_product_ids;
+"""
+
+QUERIES = ("у", "уст", "установка", "ремонт 123", "456789", "нет такого")
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        user_id = session.scalar(select(User.id).order_by(User.id).limit(1))
+        started = time.perf_counter()
+        session.connection().exec_driver_sql(COPY_PRODUCTS_SQL, {"count": args.products, "user_id": str(user_id)})
+        session.commit()
+        print(f"добавлено {args.products} услуг за {time.perf_counter() - started:.1f} с")
+        try:
+            explained = search_statement("products", user_id, "уст", args.limit).compile(
+                session.bind, compile_kwargs={"literal_binds": True}
+            )
+            plan = "\n".join(session.execute(text(f"EXPLAIN {explained}")).scalars())
+            index_used = "ix_products_user_name_trgm" in plan
+            print(f"GIN-индекс в плане: {'да' if index_used else 'нет (нет pg_trgm?)'}")
+
+            small = session.execute(
+                select(Product.id, Product.name, Product.price)
+                .where(Product.user_id == user_id)
+                .limit(SEARCH_CACHE_MAX_ITEMS)
+            ).all()
+            entries = [(name.lower(), entry_id, name, price) for entry_id, name, price in small]
+
+            print(f"{'запрос':<14}{'база p50':>10}{'база p95':>10}{'кэш p50':>10}{'кэш p95':>10}  мс")
+            for query in QUERIES:
+                statement = search_statement("products", user_id, query, args.limit)
+                database, cached = [], []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    session.execute(statement).all()
+                    database.append((time.perf_counter() - started) * 1000)
+                    started = time.perf_counter()
+                    match_entries(entries, query, args.limit)
+                    cached.append((time.perf_counter() - started) * 1000)
+                print(f"{query:<14}{percentiles(database)[0]:>10.2f}{percentiles(database)[1]:>10.2f}"
+                      f"{percentiles(cached)[0]:>10.3f}{percentiles(cached)[1]:>10.3f}")
+            print(f"кэш: справочник из {len(entries)} услуг в памяти процесса")
+        finally:
+            session.rollback()
+            session.connection().exec_driver_sql(CLEANUP_SQL)
+            session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Микробенчмарк: стоимость выпуска и проверки access-токена на один запрос
+
+    python -m scripts.bench_tokens --number 200000
+"""
+import argparse
+import timeit
+from uuid import uuid4
+
+from app.models import UserRole
+from app.tokens import ACCESS_TOKEN_TTL, decode_token, encode_token, revocations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200_000)
+    args = parser.parse_args()
+
+    user_id = uuid4()
+    token = encode_token(user_id, UserRole.USER, "access", ACCESS_TOKEN_TTL)
+
+    def report(name, func):
+        seconds = min(timeit.repeat(func, number=args.number, repeat=3)) / args.number
+        print(f"{name:<28} {seconds * 1e6:>8.2f} {1 / seconds:>12.0f}")
+
+    print(f"{'операция':<28} {'мкс/оп':>8} {'оп/с':>12}")
+    report("выпуск", lambda: encode_token(user_id, UserRole.USER, "access", ACCESS_TOKEN_TTL))
+    report("проверка", lambda: decode_token(token, "access"))
+
+    # Та же проверка, когда в списке отзыва 100 тыс. токенов
+    for _ in range(100_000):
+        revocations.revoke(decode_token(encode_token(uuid4(), UserRole.USER, "access", ACCESS_TOKEN_TTL), "access"))
+    report("проверка, 100k отозванных", lambda: decode_token(token, "access"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Нагрузочный тест GET /users/me: запросы в секунду при 50, 200 и 1000 клиентах
+
+Access-токены выпускаются прямо в скрипте, поэтому AUTH_SECRET_KEY у скрипта
+и сервера должен совпадать. Запуск (сервер должен быть поднят, например
+`uvicorn app.main:app --workers 1`):
+    python scripts/bench_users.py --base-url http://127.0.0.1:8000 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from sqlalchemy import create_engine, text
+
+
+def load_tokens(limit: int = 100) -> list[str]:
+    """Берет пользователей из базы (синхронный движок, как в Alembic) и выпускает им access-токены"""
+    from dotenv import load_dotenv
+    load_dotenv()
+    from app.models import UserRole
+    from app.tokens import ACCESS_TOKEN_TTL, encode_token
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT id, role FROM users LIMIT :limit"), {"limit": limit})
+        return [encode_token(row.id, UserRole(row.role), "access", ACCESS_TOKEN_TTL) for row in rows]
+
+
+async def run_level(base_url: str, tokens: list[str], concurrency: int, duration: float) -> tuple[int, int, float]:
+    """Держит `concurrency` клиентов в течение `duration` секунд, возвращает (успешных, ошибок, rps)"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    ok = 0
+    failed = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def worker(offset: int) -> None:
+            nonlocal ok, failed
+            i = offset
+            while time.perf_counter() < deadline:
+                token = tokens[i % len(tokens)]
+                i += 1
+                try:
+                    response = await client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+                    if response.status_code == 200:
+                        ok += 1
+                    else:
+                        failed += 1
+                except httpx.HTTPError:
+                    failed += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return ok, failed, ok / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--levels", default="50,200,1000")
+    args = parser.parse_args()
+
+    tokens = load_tokens()
+    if not tokens:
+        print("В таблице users нет записей, примените миграции: alembic upgrade head")
+        return
+
+    print(f"{'клиентов':>10} {'успешно':>10} {'ошибок':>8} {'req/s':>10}")
+    for level in (int(x) for x in args.levels.split(",")):
+        ok, failed, rps = await run_level(args.base_url, tokens, level, args.duration)
+        print(f"{level:>10} {ok:>10} {failed:>8} {rps:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+"""Вставка с ключами uuid4 против uuid7: скорость, размер индекса PK и объем WAL
+
+Для каждой схемы создается таблица формы order_products, в нее пачками через
+COPY вставляется --rows строк. Ключи генерируются в Python заранее, в замер
+входит только COPY. Таблицы удаляются после замера. Запуск на тестовой базе:
+    python -m scripts.bench_uuid_keys --rows 10000000
+"""
+import argparse
+import io
+import time
+from uuid import uuid4
+
+from app.database import engine
+from app.ids import uuid7
+
+GENERATORS = {"uuid4": uuid4, "uuid7": uuid7}
+
+CREATE_SQL = """
+    DROP TABLE IF EXISTS bench_keys_{name};
+    CREATE TABLE bench_keys_{name} (
+        id UUID PRIMARY KEY,
+        order_id UUID NOT NULL,
+        quantity INTEGER NOT NULL,
+        price NUMERIC(10, 2) NOT NULL
+    );
+"""
+
+STATS_SQL = """
+    SELECT pg_relation_size('bench_keys_{name}_pkey'),
+           pg_relation_size('bench_keys_{name}'),
+           coalesce(idx_blks_read, 0), coalesce(idx_blks_hit, 0)
+    FROM pg_statio_user_indexes WHERE indexrelname = 'bench_keys_{name}_pkey'
+"""
+
+
+def make_batch(generate, size: int) -> io.StringIO:
+    order_id = generate()
+    buffer = io.StringIO()
+    buffer.writelines(f"{generate()}\t{order_id}\t1\t100.00\n" for _ in range(size))
+    buffer.seek(0)
+    return buffer
+
+
+def run(connection, name: str, rows: int, batch: int) -> dict:
+    cursor = connection.cursor()
+    cursor.execute(CREATE_SQL.format(name=name))
+    connection.commit()
+    cursor.execute("SELECT pg_current_wal_lsn()")
+    wal_start = cursor.fetchone()[0]
+
+    generate = GENERATORS[name]
+    total = tail = 0.0
+    tail_from = rows - rows // 10
+    inserted = 0
+    while inserted < rows:
+        size = min(batch, rows - inserted)
+        buffer = make_batch(generate, size)
+        started = time.perf_counter()
+        cursor.copy_expert(f"COPY bench_keys_{name} (id, order_id, quantity, price) FROM STDIN", buffer)
+        connection.commit()
+        elapsed = time.perf_counter() - started
+        total += elapsed
+        if inserted >= tail_from:
+            tail += elapsed
+        inserted += size
+
+    cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (wal_start,))
+    wal_bytes = cursor.fetchone()[0]
+    # Статистика ввода-вывода отправляется сборщику асинхронно
+    cursor.execute("SELECT pg_stat_force_next_flush()")
+    connection.commit()
+    time.sleep(1)
+    cursor.execute(STATS_SQL.format(name=name))
+    index_size, table_size, blocks_read, blocks_hit = cursor.fetchone()
+    return {
+        "rows_per_second": rows / total,
+        "tail_rows_per_second": (rows - tail_from) / tail if tail else 0.0,
+        "index_size": index_size,
+        "table_size": table_size,
+        "wal_bytes": wal_bytes,
+        "index_blocks_read": blocks_read,
+        "index_blocks_hit": blocks_hit,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=50_000)
+    parser.add_argument("--keep", action="store_true", help="не удалять таблицы после замера")
+    args = parser.parse_args()
+
+    connection = engine.raw_connection()
+    try:
+        results = {name: run(connection, name, args.rows, args.batch) for name in GENERATORS}
+        if not args.keep:
+            cursor = connection.cursor()
+            for name in GENERATORS:
+                cursor.execute(f"DROP TABLE bench_keys_{name}")
+            connection.commit()
+    finally:
+        connection.close()
+
+    mb = 1024 * 1024
+    print(f"Строк: {args.rows}, пачка COPY: {args.batch}")
+    print(f"{'':8}{'строк/с':>12}{'посл. 10%':>12}{'индекс PK':>12}{'таблица':>12}{'WAL':>12}{'чтений PK':>12}")
+    for name, result in results.items():
+        print(
+            f"{name:8}{result['rows_per_second']:>12,.0f}{result['tail_rows_per_second']:>12,.0f}"
+            f"{result['index_size'] / mb:>10.1f}MB{result['table_size'] / mb:>10.1f}MB"
+            f"{result['wal_bytes'] / mb:>10.1f}MB{result['index_blocks_read']:>12,}"
+        )
+
+
+if __name__ == "__main__":
+    main()
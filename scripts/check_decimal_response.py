@@ -0,0 +1,78 @@
+"""Проверка: Decimal из обычного dict доходит до JSON без потери точности
+
+Маршруты на OrjsonRoute (app/serialization.py) возвращают dict, список или
+None, с response_model и без, синхронно и асинхронно. Скрипт падает, если
+деньги стали float, потерялся статус или сломались зависимости. База не нужна:
+    python -m scripts.check_decimal_response
+"""
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, FastAPI, Query
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+from app.serialization import OrjsonResponse, OrjsonRoute
+
+PRICE = Decimal("12345678901234.57")
+
+
+class Total(BaseModel):
+    total: Decimal
+
+
+def get_factor(factor: int = Query(default=1)) -> int:
+    return factor
+
+
+def build_app() -> FastAPI:
+    router = APIRouter(route_class=OrjsonRoute)
+
+    @router.get("/async")
+    async def async_dict(factor: int = Depends(get_factor)):
+        return {"rows": [{"total": PRICE * factor}]}
+
+    @router.get("/sync")
+    def sync_list():
+        return [PRICE]
+
+    @router.post("/created", status_code=201)
+    async def created():
+        return {"total": PRICE}
+
+    @router.post("/empty", status_code=204)
+    async def empty():
+        return None
+
+    @router.get("/model", response_model=Total)
+    async def with_model():
+        return {"total": PRICE}
+
+    app = FastAPI(default_response_class=OrjsonResponse)
+    app.include_router(router)
+    return app
+
+
+def main() -> None:
+    with TestClient(build_app()) as client:
+        response = client.get("/async", params={"factor": 3})
+        assert response.status_code == 200, response.status_code
+        assert b'"total":"37037036703703.71"' in response.content, response.content
+
+        response = client.get("/sync")
+        assert response.content == b'["12345678901234.57"]', response.content
+
+        response = client.post("/created")
+        assert response.status_code == 201, response.status_code
+        assert response.content == b'{"total":"12345678901234.57"}', response.content
+
+        response = client.post("/empty")
+        assert response.status_code == 204 and not response.content, response.content
+
+        # С response_model сериализует Pydantic: Decimal тоже строкой
+        response = client.get("/model")
+        assert response.json() == {"total": "12345678901234.57"}, response.content
+    print("OK: Decimal без response_model и с ним отдается строкой без потери точности")
+
+
+if __name__ == "__main__":
+    main()
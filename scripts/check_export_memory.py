@@ -0,0 +1,84 @@
+"""Проверка, что экспорт заказов держит память постоянной на больших объемах
+
+Выгрузка читается тем же генератором, что и GET /orders/export, байты
+отбрасываются. Скрипт падает, если прирост пикового RSS превысил потолок или
+строк меньше ожидаемого. Данные на 1М строк для одного пользователя:
+    python -m scripts.generate_data --users 1 --orders 350000 --truncate
+    python -m scripts.check_export_memory --min-lines 1000000 --max-rss-mb 64
+"""
+import argparse
+import asyncio
+import resource
+import sys
+import time
+from uuid import UUID
+
+from sqlalchemy import func, select
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def export(user_id: UUID | None, format: str) -> tuple[UUID, int, int]:
+    from app.database import async_engine
+    from app.export import csv_chunks, export_statement, iter_batches, xlsx_chunks
+    from app.models import Order, OrderProduct
+
+    if user_id is None:
+        async with async_engine.connect() as connection:
+            user_id = await connection.scalar(
+                select(Order.user_id)
+                .join(OrderProduct, OrderProduct.order_id == Order.id)
+                .group_by(Order.user_id)
+                .order_by(func.count().desc())
+                .limit(1)
+            )
+    lines = 0
+
+    async def counted():
+        nonlocal lines
+        async for rows in iter_batches(async_engine, export_statement(user_id)):
+            lines += len(rows)
+            yield rows
+
+    chunks = xlsx_chunks if format == "xlsx" else csv_chunks
+    size = 0
+    async for chunk in chunks(counted()):
+        size += len(chunk)
+    await async_engine.dispose()
+    return user_id, lines, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=UUID, help="по умолчанию пользователь с наибольшим числом позиций")
+    parser.add_argument("--format", choices=("csv", "xlsx"), default="csv")
+    parser.add_argument("--min-lines", type=int, default=0)
+    parser.add_argument("--max-rss-mb", type=float, default=64, help="допустимый прирост пикового RSS")
+    args = parser.parse_args()
+
+    import app.database  # noqa: F401 - импорт драйверов до замера базовой линии
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    user_id, lines, size = asyncio.run(export(args.user_id, args.format))
+    elapsed = time.perf_counter() - started
+    growth = peak_rss_mb() - baseline
+
+    print(f"Пользователь:     {user_id}")
+    print(f"Формат:           {args.format}")
+    print(f"Строк:            {lines}")
+    print(f"Размер, МБ:       {size / 2**20:.1f}")
+    print(f"Время, с:         {elapsed:.1f}")
+    print(f"Строк в секунду:  {lines / elapsed:.0f}")
+    print(f"Прирост RSS, МБ:  {growth:.1f} (потолок {args.max_rss_mb:g})")
+    if lines < args.min_lines:
+        sys.exit(f"Строк {lines}, ожидалось не меньше {args.min_lines}")
+    if growth > args.max_rss_mb:
+        sys.exit("Прирост памяти превысил потолок")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Проверка: каждая выборка /metrics относится к семейству с HELP и TYPE того же имени
+
+Счетчики объявляются и отдаются с суффиксом _total, у гистограмм выборки
+name_bucket, name_sum и name_count. Нужны DATABASE_URL и AUTH_SECRET_KEY:
+    python -m scripts.check_metrics_format
+"""
+import re
+
+from fastapi.testclient import TestClient
+
+from app.ids import uuid7
+from app.main import app
+from app.models import UserRole
+from app.tokens import issue_token_pair
+
+SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$")
+HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+
+
+def parse(text: str) -> tuple[dict, dict, list]:
+    """Разбирает текстовый формат: семейства из HELP и TYPE и имена выборок"""
+    helps, types, samples = {}, {}, []
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name = line.split(" ", 3)[2]
+            assert name not in helps, f"HELP {name} повторяется"
+            helps[name] = line
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name in helps, f"TYPE {name} без HELP"
+            assert name not in types, f"TYPE {name} повторяется"
+            types[name] = kind
+        elif line:
+            match = SAMPLE.match(line)
+            assert match, f"не разобрана строка: {line}"
+            float(match.group(3))
+            samples.append(match.group(1))
+    return helps, types, samples
+
+
+def family_of(sample: str, types: dict) -> str | None:
+    if sample in types:
+        return sample
+    for suffix in HISTOGRAM_SUFFIXES:
+        base = sample.removesuffix(suffix)
+        if base != sample and types.get(base) == "histogram":
+            return base
+    return None
+
+
+def main() -> None:
+    headers = {"Authorization": "Bearer " + issue_token_pair(uuid7(), UserRole.USER)["access_token"]}
+    with TestClient(app) as client:
+        # Запрос в базу, чтобы появились выборки SQL-счетчиков
+        client.get("/users/me", headers=headers)
+        text = client.get("/metrics").text
+
+    helps, types, samples = parse(text)
+    assert helps.keys() == types.keys(), set(helps) ^ set(types)
+    for name, kind in types.items():
+        if kind == "counter":
+            assert name.endswith("_total"), f"счетчик {name} без суффикса _total"
+    for sample in samples:
+        family = family_of(sample, types)
+        assert family is not None, f"выборка {sample} без HELP/TYPE своего имени"
+        if types[family] == "histogram":
+            assert sample != family, f"гистограмма {family} отдает выборку без суффикса"
+    print(f"OK: {len(types)} семейств, {len(samples)} выборок")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Проверка: POST /orders отклоняет количество вне INTEGER с 422, а не падает с 500
+
+Запросы не доходят до базы (отказ на проверке схемы), но приложение
+импортируется целиком, поэтому нужны DATABASE_URL и AUTH_SECRET_KEY:
+    python -m scripts.check_order_create_limits
+"""
+from fastapi.testclient import TestClient
+
+from app.ids import uuid7
+from app.main import app
+from app.models import MAX_QUANTITY, UserRole
+from app.tokens import issue_token_pair
+
+
+def main() -> None:
+    headers = {"Authorization": "Bearer " + issue_token_pair(uuid7(), UserRole.USER)["access_token"]}
+    with TestClient(app) as client:
+        for quantity in (0, -1, MAX_QUANTITY + 1, 2**63):
+            body = {"customer_id": str(uuid7()), "items": [{"product_id": str(uuid7()), "quantity": quantity}]}
+            response = client.post("/orders", json=body, headers=headers)
+            assert response.status_code == 422, (quantity, response.status_code, response.text)
+            assert response.json()["detail"][0]["loc"][-1] == "quantity", response.text
+    print(f"OK: количество вне 1..{MAX_QUANTITY} отклоняется с 422")
+
+
+if __name__ == "__main__":
+    main()
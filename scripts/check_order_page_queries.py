@@ -0,0 +1,77 @@
+"""Проверка: страница GET /orders стоит постоянное число запросов к базе
+
+Для пользователя с наибольшим числом заказов проходит все страницы списка
+обоими путями (ORM + Pydantic и быстрый путь на DTO) и падает, если хоть одна
+потребовала больше EXPECTED_QUERIES запросов или JSON путей разошелся.
+    python -m scripts.check_order_page_queries --limit 5
+"""
+import argparse
+import asyncio
+import json
+
+from sqlalchemy import event, func, select
+
+from app import schemas
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Order
+from app.orders import fetch_order_page, next_cursor, order_page_statement
+from app.serialization import dumps
+
+EXPECTED_QUERIES = 2
+
+
+def check_queries(page: int, path: str, statements: list[str]) -> None:
+    assert len(statements) == EXPECTED_QUERIES, (
+        f"страница {page} ({path}): {len(statements)} запросов вместо {EXPECTED_QUERIES}\n" + "\n".join(statements)
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with AsyncSessionLocal() as db:
+            user_id = await db.scalar(
+                select(Order.user_id).group_by(Order.user_id).order_by(func.count().desc()).limit(1)
+            )
+            if user_id is None:
+                print("В таблице orders нет записей, примените миграции: alembic upgrade head")
+                return
+
+            cursor, pages = None, 0
+            while True:
+                pages += 1
+                db.expunge_all()
+                statements.clear()
+                orders = (await db.scalars(order_page_statement(user_id, args.limit, cursor))).unique().all()
+                orders, orm_cursor = next_cursor(orders, args.limit)
+                orm_page = schemas.OrderPage(
+                    items=[schemas.Order.model_validate(order) for order in orders], next_cursor=orm_cursor
+                )
+                check_queries(pages, "ORM", statements)
+
+                statements.clear()
+                page = await fetch_order_page(db, user_id, args.limit, cursor)
+                check_queries(pages, "DTO", statements)
+
+                assert json.loads(orm_page.model_dump_json()) == json.loads(dumps(page)), (
+                    f"страница {pages}: JSON путей ORM и DTO различается"
+                )
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+        print(f"OK: {pages} страниц, по {EXPECTED_QUERIES} запроса на страницу")
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
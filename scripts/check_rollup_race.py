@@ -0,0 +1,98 @@
+"""Проверка: пересчет выручки не теряет месяц, в который пишет незакоммиченная транзакция
+
+Сценарий гонки из миграции 1c0622febfa9 на тестовой базе:
+    1. метка (user_id, month) уже есть и закоммичена;
+    2. писатель вставляет заказ в этот месяц и не коммитит;
+    3. refresh_rollups пересчитывает помеченные месяцы;
+    4. писатель коммитит, refresh_rollups запускается еще раз.
+Итог в revenue_rollups должен совпасть с суммой по заказам. Тестовый заказ
+затем удаляется и месяц пересчитывается заново.
+    python -m scripts.check_rollup_race
+"""
+import asyncio
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app.database import async_engine, engine
+from app.ids import uuid7
+from app.rollups import refresh_rollups
+
+MONTH_SQL = "date_trunc('month', now() AT TIME ZONE 'UTC')::date"
+
+PICK_SQL = text("""
+    SELECT c.user_id, c.id AS customer_id, p.id AS product_id
+    FROM customers c JOIN products p ON p.user_id = c.user_id
+    LIMIT 1
+""")
+
+MARK_SQL = text(f"""
+    INSERT INTO revenue_rollup_dirty (user_id, month) VALUES (:user_id, {MONTH_SQL})
+    ON CONFLICT DO NOTHING
+""")
+
+ROLLUP_SQL = text(f"SELECT coalesce(sum(revenue), 0) FROM revenue_rollups WHERE user_id = :user_id AND month = {MONTH_SQL}")
+
+ACTUAL_SQL = text(f"""
+    SELECT coalesce(sum(op.quantity * op.price), 0)
+    FROM orders o JOIN order_products op ON op.order_id = o.id
+    WHERE o.user_id = :user_id AND date_trunc('month', o.created_at AT TIME ZONE 'UTC')::date = {MONTH_SQL}
+""")
+
+
+def refresh() -> int:
+    async def run() -> int:
+        try:
+            return await refresh_rollups(async_engine)
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(run())
+
+
+def main() -> None:
+    with engine.connect() as connection:
+        picked = connection.execute(PICK_SQL).one()
+        user = {"user_id": picked.user_id}
+        connection.execute(MARK_SQL, user)
+        connection.commit()
+
+    order_id = uuid7()
+    with engine.connect() as writer:
+        writer.execute(
+            text("""
+                INSERT INTO orders (id, number, created_at, customer_id, user_id)
+                SELECT :id, coalesce(max(number), 0) + 1000000, :created_at, :customer_id, :user_id
+                FROM orders WHERE user_id = :user_id
+            """),
+            {"id": order_id, "created_at": datetime.now(timezone.utc), "customer_id": picked.customer_id, **user},
+        )
+        writer.execute(
+            text("""
+                INSERT INTO order_products (id, quantity, price, order_id, product_id)
+                VALUES (:id, 1, :price, :order_id, :product_id)
+            """),
+            {"id": uuid7(), "price": Decimal("1234.56"), "order_id": order_id, "product_id": picked.product_id},
+        )
+        # Пересчет идет, пока писатель держит транзакцию открытой
+        during = refresh()
+        writer.commit()
+
+    try:
+        after = refresh()
+        with engine.connect() as connection:
+            rollup = connection.execute(ROLLUP_SQL, user).scalar()
+            actual = connection.execute(ACTUAL_SQL, user).scalar()
+        print(f"пересчитано месяцев: во время записи {during}, после коммита {after}")
+        print(f"выручка месяца: в revenue_rollups {rollup}, по заказам {actual}")
+        assert rollup == actual, "месяц остался устаревшим: метка потеряна во время записи"
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM orders WHERE id = :id"), {"id": order_id})
+        refresh()
+    print("OK: незакоммиченная запись не теряет метку месяца")
+
+
+if __name__ == "__main__":
+    main()
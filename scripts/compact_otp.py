@@ -0,0 +1,22 @@
+"""Очистка one_time_passwords: удаление устаревших секций и пакетное удаление старых кодов
+
+Для запуска по расписанию (cron, systemd timer, CronJob):
+    python -m scripts.compact_otp
+"""
+import asyncio
+import logging
+
+from app.database import async_engine
+from app.otp_compaction import compact_otp
+
+
+async def main() -> None:
+    try:
+        await compact_otp(async_engine)
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,343 @@
+"""Генератор синтетических данных для нагрузочного тестирования
+
+Повторяет распределения сид-миграций (коды операторов, 60/40 юр./физ. лица,
+цены услуг 500-50000, цена в заказе ±10%, сценарии OTP-злоупотреблений), но
+масштабируется до миллионов заказов: данные строятся параллельно в процессах
+по шардам из SHARD_USERS пользователей и заливаются через COPY.
+
+Результат детерминирован для одинаковых --seed и --now и не зависит от --workers.
+Рассчитан на пустую базу после `alembic upgrade head` (или с флагом --truncate):
+    python -m scripts.generate_data --users 20000 --orders 1000000 --workers 4 --seed 42
+"""
+import argparse
+import importlib.util
+import io
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import UUID
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+from app.ids import uuid7_from
+from app.inn import with_check_digits
+
+SHARD_USERS = 1000
+COPY_BUFFER_ROWS = 50_000
+
+# Коды операторов из миграции пользователей dbf17d2f10c7
+OPERATOR_CODES = ['900', '901', '902', '903', '904', '905', '906', '907',
+                  '908', '909', '910', '911', '912', '913', '914', '915',
+                  '916', '917', '918', '919', '920', '921', '922', '923',
+                  '924', '925', '926', '927', '928', '929', '930', '931',
+                  '932', '933', '934', '936', '937', '938', '939', '950',
+                  '951', '952', '953', '954', '955', '956', '957', '958',
+                  '959', '960', '961', '962', '963', '964', '965', '966',
+                  '967', '968', '969', '977', '978', '980', '981', '982',
+                  '983', '984', '985', '986', '987', '988', '989', '991',
+                  '992', '993', '994', '995', '996', '997', '999']
+
+VERSIONS = Path(__file__).resolve().parent.parent / "alembic" / "versions"
+
+
+def load_seed_module(prefix: str):
+    """Списки имен и названий берутся прямо из сид-миграций"""
+    path = next(VERSIONS.glob(f"{prefix}_*.py"))
+    spec = importlib.util.spec_from_file_location(f"seed_{prefix}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_users_seed = load_seed_module("dbf17d2f10c7")
+_customers_seed = load_seed_module("9ed9d9dcf4b2")
+_products_seed = load_seed_module("a1b2c3d4e5f6")
+
+USER_NAMES = _users_seed.USERS
+COMPANY_PREFIXES = _customers_seed.COMPANY_PREFIXES
+COMPANY_NAMES = _customers_seed.COMPANY_NAMES
+INDIVIDUAL_NAMES = _customers_seed.INDIVIDUAL_NAMES
+PRODUCT_NAMES = _products_seed.PRODUCT_NAMES
+
+# Множители, взаимно простые с 10^7 и 10^10: номер пользователя переводится
+# в телефон и основу ИНН взаимно однозначно, поэтому уникальность не нужно проверять
+PHONE_MULTIPLIER = 7_654_321
+INN_MULTIPLIER = 738_290_157_731
+
+
+def database_url() -> str:
+    load_dotenv()
+    return make_url(os.environ["DATABASE_URL"]).set(drivername="postgresql+psycopg2").render_as_string(
+        hide_password=False
+    )
+
+
+def make_uuid(rng: random.Random, moment: datetime) -> UUID:
+    """UUIDv7, как у приложения (app/ids.py): время - moment, счетчик и хвост - из rng
+
+    Ключи растут вместе со временем создания строк, поэтому индексы первичных
+    ключей получаются такими же, как при работе приложения, а не как от uuid4.
+    """
+    return uuid7_from(int(moment.timestamp() * 1000), rng.getrandbits(12), rng.getrandbits(62))
+
+
+def user_phone(index: int, offset: int) -> str:
+    code = OPERATOR_CODES[index % len(OPERATOR_CODES)]
+    subscriber = (index // len(OPERATOR_CODES) * PHONE_MULTIPLIER + offset) % 10**7
+    return f"+7{code}{subscriber:07d}"
+
+
+def user_inn(index: int, offset: int) -> str:
+    return with_check_digits(f"{(index * INN_MULTIPLIER + offset) % 10**10:010d}")
+
+
+def random_digits(rng: random.Random, length: int) -> str:
+    return f"{rng.randrange(10**length):0{length}d}"
+
+
+def random_phone(rng: random.Random) -> str:
+    return f"+7{rng.choice(OPERATOR_CODES)}{random_digits(rng, 7)}"
+
+
+def copy_value(value) -> str:
+    """Значение в текстовом формате COPY"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+class CopyWriter:
+    """Буфер строк для COPY ... FROM STDIN одной таблицы"""
+
+    def __init__(self, group: "CopyGroup", table: str, columns: tuple[str, ...]):
+        self.group = group
+        self.table = table
+        self.sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        self.buffer = io.StringIO()
+        self.rows = 0
+        self.total = 0
+        group.writers.append(self)
+
+    def write(self, *values) -> None:
+        self.buffer.write("\t".join(map(copy_value, values)))
+        self.buffer.write("\n")
+        self.rows += 1
+        if self.rows >= COPY_BUFFER_ROWS:
+            self.group.flush()
+
+    def flush(self, cursor) -> None:
+        if self.rows:
+            self.buffer.seek(0)
+            cursor.copy_expert(self.sql, self.buffer)
+            self.total += self.rows
+            self.buffer = io.StringIO()
+            self.rows = 0
+
+
+class CopyGroup:
+    """Связанные таблицы сбрасываются вместе в порядке создания писателей,
+    чтобы родительские строки попадали в базу раньше ссылающихся на них"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.writers: list[CopyWriter] = []
+
+    def table(self, table: str, columns: tuple[str, ...]) -> CopyWriter:
+        return CopyWriter(self, table, columns)
+
+    def flush(self) -> None:
+        for writer in self.writers:
+            writer.flush(self.cursor)
+
+    def totals(self) -> dict[str, int]:
+        return {writer.table: writer.total for writer in self.writers}
+
+
+def generate_shard(task: tuple) -> dict:
+    """Строит и заливает шард пользователей со всеми их заказчиками, услугами и заказами"""
+    url, seed, now, shard, first_user, users, customers_per_user, products_per_user, orders_per_user = task
+    rng = random.Random(f"{seed}:{shard}")
+    offsets = random.Random(f"{seed}:offsets")
+    phone_offset, inn_offset = offsets.randrange(10**7), offsets.randrange(10**12)
+    base_date = now - timedelta(days=365)
+
+    engine = create_engine(url, poolclass=NullPool)
+    connection = engine.raw_connection()
+    try:
+        group = CopyGroup(connection.cursor())
+        users_out = group.table("users", ("id", "surname", "name", "patronymic", "phone_number", "inn", "role"))
+        customers_out = group.table("customers", ("id", "name", "inn", "customer_type", "user_id"))
+        products_out = group.table("products", ("id", "name", "price", "is_countable", "user_id"))
+        orders_out = group.table("orders", ("id", "number", "created_at", "customer_id", "user_id"))
+        items_out = group.table("order_products", ("id", "quantity", "price", "order_id", "product_id"))
+        counters_out = group.table("order_number_counters", ("user_id", "last_number"))
+
+        for index in range(first_user, first_user + users):
+            # Пользователи и их справочники заведены за сутки до первого заказа, по миллисекунде на пользователя
+            registered_at = base_date - timedelta(days=1) + timedelta(milliseconds=index)
+            user_id = make_uuid(rng, registered_at)
+            surname, name, patronymic = rng.choice(USER_NAMES)
+            users_out.write(user_id, surname, name, patronymic,
+                            user_phone(index, phone_offset), user_inn(index, inn_offset), "user")
+
+            customers = []
+            used_inns = set()
+            for _ in range(rng.randint(1, 2 * customers_per_user - 1)):
+                # 60% юр. лица, 40% физ. лица
+                is_legal = rng.random() < 0.6
+                if is_legal:
+                    customer_name = f'{rng.choice(COMPANY_PREFIXES)} "{rng.choice(COMPANY_NAMES)}"'
+                else:
+                    customer_name = " ".join(rng.choice(INDIVIDUAL_NAMES))
+                while True:
+                    inn = with_check_digits(random_digits(rng, 9 if is_legal else 10))
+                    if inn not in used_inns:
+                        used_inns.add(inn)
+                        break
+                customer_id = make_uuid(rng, registered_at)
+                customers.append(customer_id)
+                customers_out.write(customer_id, customer_name, inn,
+                                    "legal_entity" if is_legal else "individual", user_id)
+
+            products = []
+            for _ in range(rng.randint(1, 2 * products_per_user - 1)):
+                product_id = make_uuid(rng, registered_at)
+                price = round(rng.uniform(500.0, 50000.0), -2)
+                products.append((product_id, price))
+                products_out.write(product_id, rng.choice(PRODUCT_NAMES), f"{price:.2f}", rng.random() < 0.8, user_id)
+
+            orders = rng.randint(0, 2 * orders_per_user)
+            for number in range(1, orders + 1):
+                created_at = base_date + timedelta(days=rng.randint(0, 365),
+                                                   hours=rng.randint(8, 20),
+                                                   minutes=rng.randint(0, 59))
+                order_id = make_uuid(rng, created_at)
+                orders_out.write(order_id, number, created_at, rng.choice(customers), user_id)
+                for product_id, product_price in rng.sample(products, rng.randint(1, min(5, len(products)))):
+                    # Цена в заказе отличается от текущей на ±10%, не меньше 100
+                    price = max(round(product_price * rng.uniform(0.9, 1.1), -2), 100)
+                    items_out.write(make_uuid(rng, created_at), rng.randint(1, 10), f"{price:.2f}",
+                                    order_id, product_id)
+            if orders:
+                counters_out.write(user_id, orders)
+
+        group.flush()
+        connection.commit()
+        return group.totals()
+    finally:
+        connection.close()
+        engine.dispose()
+
+
+def generate_otp(url: str, seed: int, now: datetime, scale: int) -> int:
+    """Сценарии миграции 082450edab94, умноженные на scale
+
+    Коды хранятся хэшами (app/otp.py), ключ берется из AUTH_SECRET_KEY: чтобы
+    живые коды проходили проверку, генератор и приложение запускаются с одним ключом.
+    """
+    from app.otp import hash_code
+
+    rng = random.Random(f"{seed}:otp")
+    rows = []
+
+    def add(phone, created_at, is_used, code=None):
+        row_id = make_uuid(rng, created_at)
+        code = code if code is not None else rng.randint(1000, 9999)
+        rows.append((row_id, phone, hash_code(phone, code), created_at, is_used))
+
+    for _ in range(50 * scale):  # успешно использованные
+        add(random_phone(rng), now - timedelta(days=rng.randint(1, 30), hours=rng.randint(0, 23),
+                                               minutes=rng.randint(0, 59)), True)
+    for _ in range(30 * scale):  # неиспользованные истекшие
+        add(random_phone(rng), now - timedelta(days=rng.randint(1, 7), hours=rng.randint(0, 23)), False)
+    for _ in range(20 * scale):  # брутфорс с одного номера
+        add('+79991234567', now - timedelta(minutes=rng.randint(1, 30)), False)
+    for _ in range(15 * scale):  # ночные запросы
+        night = now.replace(hour=rng.randint(2, 5), minute=rng.randint(0, 59)) - timedelta(days=rng.randint(0, 5))
+        add(random_phone(rng), night, rng.choice([True, False]))
+    for i in range(10 * scale):  # перебор последовательных номеров
+        add(f'+7999{i:07d}', now - timedelta(hours=rng.randint(1, 3)), False)
+    for i in range(8 * scale):  # один и тот же код много раз
+        add('+79998887766', now - timedelta(minutes=i * 2), False, code=1234)
+    for _ in range(10 * scale):  # очень старые неиспользованные
+        add(random_phone(rng), now - timedelta(days=rng.randint(60, 180)), False)
+    for _ in range(10 * scale):  # свежие, ожидают использования
+        add(random_phone(rng), now - timedelta(minutes=rng.randint(1, 5)), False)
+
+    engine = create_engine(url, poolclass=NullPool)
+    connection = engine.raw_connection()
+    try:
+        group = CopyGroup(connection.cursor())
+        writer = group.table("one_time_passwords", ("id", "phone_number", "code_hash", "created_at", "is_used"))
+        for row in rows:
+            writer.write(*row)
+        group.flush()
+        connection.commit()
+    finally:
+        connection.close()
+        engine.dispose()
+    return len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--customers-per-user", type=int, default=20, help="в среднем")
+    parser.add_argument("--products-per-user", type=int, default=10, help="в среднем")
+    parser.add_argument("--orders", type=int, default=1_000_000, help="всего заказов, примерно")
+    parser.add_argument("--otp-scale", type=int, default=100, help="во сколько раз умножить OTP-сценарии сида")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--now", type=datetime.fromisoformat,
+                        default=datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0),
+                        help="точка отсчета дат (по умолчанию полночь UTC сегодня)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--truncate", action="store_true", help="очистить таблицы перед генерацией")
+    args = parser.parse_args()
+
+    url = database_url()
+    now = args.now if args.now.tzinfo else args.now.replace(tzinfo=timezone.utc)
+    orders_per_user = max(1, args.orders // args.users)
+
+    if args.truncate:
+        engine = create_engine(url, poolclass=NullPool)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "TRUNCATE users, customers, products, orders, order_products, one_time_passwords, "
+                "order_number_counters, revenue_rollups, revenue_rollup_dirty, idempotency_keys"
+            )
+        engine.dispose()
+
+    tasks = [
+        (url, args.seed, now, shard, first, min(SHARD_USERS, args.users - first),
+         args.customers_per_user, args.products_per_user, orders_per_user)
+        for shard, first in enumerate(range(0, args.users, SHARD_USERS))
+    ]
+
+    started = time.perf_counter()
+    totals: dict[str, int] = {}
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        for done, counts in enumerate(pool.imap_unordered(generate_shard, tasks), start=1):
+            for table, count in counts.items():
+                totals[table] = totals.get(table, 0) + count
+            print(f"\rшардов {done}/{len(tasks)}, заказов {totals.get('orders', 0)}", end="", flush=True)
+    print()
+    totals["one_time_passwords"] = generate_otp(url, args.seed, now, args.otp_scale)
+
+    elapsed = time.perf_counter() - started
+    for table, count in totals.items():
+        print(f"{table:<24} {count:>12}")
+    print(f"за {elapsed:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Импорт заказов из CSV или NDJSON для одного пользователя
+
+    python -m scripts.import_orders --user-id <uuid> --format csv orders.csv
+
+Формат строк описан в app/importer.py (parse_csv, parse_ndjson). Флаг
+--generate N вместо файла создает N случайных позиций из товаров и заказчиков
+пользователя - для проверки скорости загрузки.
+"""
+import argparse
+import asyncio
+import io
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import select
+
+from app.database import async_engine
+from app.importer import IMPORT_FORMATS, OrderImportError, import_file
+from app.models import Customer, Product
+
+
+async def generate_csv(user_id: UUID, items: int) -> io.BytesIO:
+    async with async_engine.connect() as connection:
+        customers = (await connection.execute(select(Customer.id).where(Customer.user_id == user_id))).scalars().all()
+        products = (await connection.execute(
+            select(Product.id, Product.price).where(Product.user_id == user_id)
+        )).all()
+    if not customers or not products:
+        raise SystemExit("У пользователя нет заказчиков или товаров")
+
+    now = datetime.now(timezone.utc)
+    out = io.StringIO()
+    out.write("order_ref,created_at,customer_id,product_id,quantity,price\n")
+    line, order = 0, 0
+    while line < items:
+        order += 1
+        created_at = (now - timedelta(minutes=random.randint(0, 525_600))).isoformat()
+        customer_id = random.choice(customers)
+        for _ in range(min(random.randint(1, 5), items - line)):
+            product_id, price = random.choice(products)
+            out.write(f"{order},{created_at},{customer_id},{product_id},{random.randint(1, 10)},{price}\n")
+            line += 1
+    return io.BytesIO(out.getvalue().encode())
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", type=UUID, required=True)
+    parser.add_argument("--format", choices=IMPORT_FORMATS, default="csv")
+    parser.add_argument("--generate", type=int, help="сгенерировать N позиций вместо чтения файла")
+    parser.add_argument("path", nargs="?")
+    args = parser.parse_args()
+
+    try:
+        if args.generate:
+            source, file_format = await generate_csv(args.user_id, args.generate), "csv"
+        elif args.path:
+            source, file_format = open(args.path, "rb"), args.format
+        else:
+            parser.error("нужен путь к файлу или --generate")
+
+        started = time.perf_counter()
+        with source:
+            result = await import_file(async_engine, args.user_id, source, file_format)
+        elapsed = time.perf_counter() - started
+        print(f"заказов: {result.orders}, позиций: {result.items}, "
+              f"номера {result.first_number}-{result.last_number}, {elapsed:.2f} с")
+    except OrderImportError as error:
+        raise SystemExit(f"Ошибка импорта: {error}")
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
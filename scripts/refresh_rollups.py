@@ -0,0 +1,23 @@
+"""Пересчет помеченных месяцев в revenue_rollups
+
+Для запуска по расписанию (cron, systemd timer, CronJob):
+    python -m scripts.refresh_rollups
+"""
+import asyncio
+import logging
+
+from app.database import async_engine
+from app.rollups import refresh_rollups
+
+
+async def main() -> None:
+    try:
+        months = await refresh_rollups(async_engine)
+        logging.getLogger(__name__).info("Пересчитано месяцев: %s", months)
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
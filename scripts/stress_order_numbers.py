@@ -0,0 +1,100 @@
+"""Стресс-тест нумерации: 100 одновременных создателей заказов для одного пользователя
+
+Создатели распределены по нескольким процессам (у каждого свой кэш блоков номеров).
+Тест падает, если хоть одна вставка нарушила uq_order_number_user. Созданные
+заказы удаляются в конце. Запуск на тестовой базе:
+    python -m scripts.stress_order_numbers --processes 4 --creators 100 --orders 20
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+MARK = 1_000_000_000
+
+
+async def run_creators(user_id: UUID, customer_id: UUID, creators: int, orders: int) -> tuple[int, int]:
+    from app.database import async_engine
+    from app.models import Order
+    from app.numbering import OrderNumberAllocator
+
+    allocator = OrderNumberAllocator(async_engine)
+    created = 0
+    failed = 0
+
+    async def creator() -> None:
+        nonlocal created, failed
+        for _ in range(orders):
+            number = await allocator.next_number(user_id)
+            try:
+                async with async_engine.begin() as connection:
+                    await connection.execute(insert(Order).values(
+                        number=MARK + number, customer_id=customer_id, user_id=user_id,
+                    ))
+                created += 1
+            except IntegrityError:
+                failed += 1
+
+    try:
+        await asyncio.gather(*(creator() for _ in range(creators)))
+    finally:
+        await async_engine.dispose()
+    return created, failed
+
+
+def process_main(args: tuple) -> tuple[int, int]:
+    return asyncio.run(run_creators(*args))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--creators", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=20, help="заказов на одного создателя")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+    from app.models import Customer, Order, OrderNumberCounter
+
+    with SessionLocal() as session:
+        user_id, customer_id = session.execute(select(Customer.user_id, Customer.id).limit(1)).one()
+        # Номера стресс-теста сдвинуты на MARK, чтобы не пересекаться с настоящими;
+        # счетчик в конце возвращается к исходному значению
+        counter = session.get(OrderNumberCounter, user_id)
+        saved_counter = counter.last_number if counter else None
+
+    per_process = [args.creators // args.processes + (i < args.creators % args.processes) for i in range(args.processes)]
+    started = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+        results = pool.map(process_main, [(user_id, customer_id, n, args.orders) for n in per_process])
+    elapsed = time.perf_counter() - started
+
+    created = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    with SessionLocal() as session:
+        stored, distinct = session.execute(
+            select(func.count(), func.count(func.distinct(Order.number)))
+            .where(Order.user_id == user_id, Order.number > MARK)
+        ).one()
+        session.execute(delete(Order).where(Order.user_id == user_id, Order.number > MARK))
+        if saved_counter is None:
+            session.execute(delete(OrderNumberCounter).where(OrderNumberCounter.user_id == user_id))
+        else:
+            session.execute(
+                update(OrderNumberCounter)
+                .where(OrderNumberCounter.user_id == user_id)
+                .values(last_number=saved_counter)
+            )
+        session.commit()
+
+    print(f"создано {created}, ошибок уникальности {failed}, в базе {stored} ({distinct} разных номеров)")
+    print(f"{created / elapsed:.0f} заказов/с за {elapsed:.1f} с")
+    assert failed == 0 and stored == distinct == args.creators * args.orders
+
+
+if __name__ == "__main__":
+    main()